@@ -0,0 +1,2456 @@
+# -*- coding: utf-8 -*-
+'''
+Client of the Kubernetes api server the k8s module uses
+
+The loader skips modules whose name starts with an underscore, this one is
+imported by the k8s module, which passes its minion options to configure.
+'''
+
+from __future__ import absolute_import
+
+import os
+import re
+import atexit
+import logging
+import random
+import shutil
+import json
+import math
+import copy
+import errno
+import base64
+import collections
+import contextlib
+import hashlib
+import marshal
+import io
+import socket
+import ssl
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from urllib import basejoin as urljoin
+import salt.ext.six as six
+from salt.ext.six.moves import queue  # pylint: disable=import-error
+import yaml
+import requests
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.exceptions import HTTPError as Urllib3Error  # pylint: disable=import-error
+from requests.packages.urllib3.exceptions import NewConnectionError  # pylint: disable=import-error
+
+from salt.utils import traverse_dict
+from salt.utils.dictupdate import merge as dictmerge
+import tornado.gen
+import tornado.ioloop
+import tornado.locks
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest, HTTPError as TornadoHTTPError
+from tornado.httputil import url_concat
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+# Setup the logger
+log = logging.getLogger(__name__)
+
+# minion options of the k8s module, see configure
+_OPTS = {}
+
+# verbs which can be repeated safely after server or connection failure
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE')
+# server errors worth to repeat the request
+RETRY_CODES = (500, 502, 503, 504)
+# socket errors of the connect, the request was never sent
+CONNECT_ERRNOS = (errno.ECONNREFUSED, errno.ENETUNREACH, errno.EHOSTUNREACH, errno.EADDRNOTAVAIL)
+# seconds of single watch request of the informer before it is renewed
+INFORMER_WATCH_TIMEOUT = 300
+# seconds the informer replays events missed since its snapshot was saved
+INFORMER_RESUME_TIMEOUT = 1
+# metadata only representation of objects and lists, plain JSON for
+# servers which do not support it
+METADATA_ACCEPT = 'application/json;as=PartialObjectMetadata;g=meta.k8s.io;v=v1,application/json'
+METADATA_LIST_ACCEPT = 'application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,application/json'
+# protobuf representation of core kinds, see _decode_protobuf
+PROTOBUF_TYPE = 'application/vnd.kubernetes.protobuf'
+PROTOBUF_ACCEPT = PROTOBUF_TYPE + ',application/json'
+PROTOBUF_MAGIC = 'k8s\x00'
+# bytes read at once out of the streamed list response
+JSON_CHUNK_SIZE = 65536
+# api, namespace, kind and name of the object or collection url
+INFORMED_PATH = re.compile(r'^/?(?P<api>api/v1|apis/[^/]+/[^/]+)'
+                           r'(?:/namespaces/(?P<namespace>[^/]+))?'
+                           r'/(?P<kind>[^/]+)(?:/(?P<name>[^/]+))?/?$')
+
+
+def configure(opts):
+    ''' use the minion options of the k8s module, its __virtual__ passes them '''
+    global _OPTS  # pylint: disable=global-statement
+    _OPTS = opts
+
+
+def _get_opt(name, default=None):
+    ''' get k8s client option from the minion config, empty outside of the loader '''
+    return _OPTS.get(name, default)
+
+
+# kinds known without asking the api server, see Kubernetes.resource,
+# plural: (apiVersion, namespaced, aliases)
+STATIC_KINDS = {
+    "pods": ("v1", True, ["pod", "po"]),
+    "services": ("v1", True, ["service", "svc", "svcs"]),
+    "deployments": ("extensions/v1beta1", True, ["deployment"]),
+    "replicasets": ("extensions/v1beta1", True, ["rs"]),
+    "replicationcontrollers": ("v1", True, ["rc", "rcs", "replicationcontroller"]),
+    "nodes": ("v1", False, ["no", "node"]),
+    "events": ("v1", True, ["ev", "event", "evs"]),
+    "limitranges": ("v1", True, ["limitrange", "limit", "limits"]),
+    "persistentvolumes": ("v1", False, ["pv", "persistentvolume", "pvs"]),
+    "persistentvolumeclaims": ("v1", True, ["pvc", "persistentvolumeclaim", "pvcs"]),
+    "resourcequotas": ("v1", True, ["resourcequota", "quota", "quotas"]),
+    "namespaces": ("v1", False, ["namespace", "ns"]),
+    "serviceaccounts": ("v1", True, []),
+    "ingresses": ("extensions/v1beta1", True, ["ing"]),
+    "horizontalpodautoscalers": ("autoscaling/v1", True, ["hpa"]),
+    "daemonsets": ("extensions/v1beta1", True, ["ds"]),
+    "configmaps": ("v1", True, ["configmap"]),
+    "componentstatuses": ("v1", False, ["cs"]),
+    "endpoints": ("v1", True, ["ep", "endpoint"]),
+    "secrets": ("v1", True, ["secret"]),
+}
+# alias -> plural of STATIC_KINDS
+KIND_ALIASES = dict((alias, plural) for plural, (_, _, aliases) in STATIC_KINDS.items()
+                    for alias in [plural] + aliases)
+
+
+def _resource(api_version, plural, namespaced):
+    ''' discovery entry, see Kubernetes.discovery '''
+    group, _, version = api_version.rpartition('/')
+    return {'group': group, 'version': version, 'plural': plural, 'namespaced': namespaced}
+
+
+def _cache_dir(*parts):
+    ''' get k8s directory inside of the minion cachedir, create it if needed '''
+    path = os.path.join(_get_opt('cachedir', tempfile.gettempdir()), 'k8s', *parts)
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path, 0o700)
+        except OSError:
+            # created by concurrent salt-call
+            pass
+    return path
+
+
+def _is_private_dir(path):
+    ''' whether the directory is owned by the user of the process and closed
+    to others, cachedir could fall back to the shared temporary directory
+    someone else could create it in '''
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return not os.path.islink(path) and os.path.isdir(path) and \
+        info.st_uid == os.getuid() and not info.st_mode & 0o077
+
+
+@contextlib.contextmanager
+def _credential_file(data, suffix='.pem'):
+    """ store credential data for the ssl module, which loads key pairs out of
+    files only, in a new directory private to the user, both are removed once
+    the with block exits """
+    directory = tempfile.mkdtemp(prefix='k8s-')
+    try:
+        if not _is_private_dir(directory):
+            raise IOError("directory {0} for credentials is not private to the user".format(directory))
+        filename = os.path.join(directory, 'credential' + suffix)
+        fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+        yield filename
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _is_connect_error(exp):
+    ''' whether the request failed before it was sent: the connection to the
+    api server timed out or was refused. Errors of reading the response are
+    not, the server could process the request already '''
+    if isinstance(exp, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(exp, requests.exceptions.ConnectionError):
+        # urllib3 MaxRetryError wrapped by requests names the failure
+        return isinstance(getattr(exp.args[0] if exp.args else None, 'reason', None), NewConnectionError)
+    if isinstance(exp, socket.error):
+        # tornado reports failed connect with the socket error
+        return exp.errno in CONNECT_ERRNOS
+    if isinstance(exp, TornadoHTTPError):
+        return exp.code == 599 and 'while connecting' in str(exp)
+    return False
+
+
+# clients of the with blocks entered by the current thread
+_AMBIENT = threading.local()
+
+
+def _get_ambient_clients():
+    if not hasattr(_AMBIENT, 'clients'):
+        _AMBIENT.clients = []
+    return _AMBIENT.clients
+
+
+class _SSLContextAdapter(HTTPAdapter):
+    """ transport adapter using prepared ssl context, trust and client
+    certificate are loaded into the context already """
+
+    def __init__(self, ssl_context=None, **kwargs):
+        self.ssl_context = ssl_context
+        super(_SSLContextAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        """ pool connections use the ssl context of the kubeconfig """
+        if self.ssl_context is not None:
+            kwargs['ssl_context'] = self.ssl_context
+        return super(_SSLContextAdapter, self).init_poolmanager(*args, **kwargs)
+
+    def cert_verify(self, conn, url, verify, cert):
+        """ certificates are checked by the ssl context, not by requests """
+        if self.ssl_context is None:
+            return super(_SSLContextAdapter, self).cert_verify(conn, url, verify, cert)
+        if self.ssl_context.verify_mode == ssl.CERT_NONE:
+            conn.cert_reqs = 'CERT_NONE'
+        else:
+            conn.cert_reqs = 'CERT_REQUIRED'
+        conn.ca_certs = None
+        conn.ca_cert_dir = None
+
+
+class _Run(object):
+    """ state of the run of the client, run is the outermost with block of
+    the thread, workers of the run share it, see Kubernetes.joined """
+
+    def __init__(self, retry_budget):
+        # (path, params) -> body of GET made during the run, see memo_get
+        self.memo = {}
+        self.retries = 0
+        self.retry_budget = retry_budget
+
+
+class _Flight(object):
+    """ GET in progress, followers wait for the result of the leader """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.body = None
+        # sys.exc_info() of the failed request
+        self.exc_info = None
+
+    def wait(self):
+        ''' wait for the leader, returns copy of the body it got or raises
+        its error '''
+        self.done.wait()
+        if self.exc_info is not None:
+            six.reraise(*self.exc_info)
+        return copy.deepcopy(self.body)
+
+
+class _JSONStream(object):
+    """ buffer of JSON text read chunk by chunk, values are decoded by the C
+    scanner of json module as soon as they are complete """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+
+    def more(self):
+        ''' read next chunk, False at the end of the stream '''
+        for chunk in self.chunks:
+            if not chunk:
+                continue
+            # drop consumed text, so the buffer holds about one value
+            self.buf = self.buf[self.pos:] + chunk
+            self.pos = 0
+            return True
+        return False
+
+    def peek(self):
+        ''' get next non whitespace character without consuming it '''
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.more():
+                raise ValueError("unexpected end of JSON stream")
+
+    def expect(self, chars):
+        ''' consume one of the chars, skipping whitespace '''
+        char = self.peek()
+        if char not in chars:
+            raise ValueError("expected one of {0!r} but got {1!r}".format(chars, char))
+        self.pos += 1
+        return char
+
+    def value(self):
+        ''' decode the next JSON value, reading more chunks until it is complete '''
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                # value is not complete yet
+                if not self.more():
+                    raise
+                continue
+            if isinstance(obj, (int, long, float)) and \
+                    (end == len(self.buf) or self.buf[end] not in ' \t\r\n,]}') and self.more():
+                # number could continue in the next chunk
+                continue
+            self.pos = end
+            return obj
+
+
+def _iter_json_list(chunks, members):
+    ''' decode JSON list object incrementally: yield elements of its items
+    array one by one, other members are stored into members dict '''
+    stream = _JSONStream(chunks)
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        if key == 'items' and stream.peek() == '[':
+            stream.expect('[')
+            if stream.peek() == ']':
+                stream.expect(']')
+            else:
+                while True:
+                    yield stream.value()
+                    if stream.expect(',]') == ']':
+                        break
+        else:
+            members[key] = stream.value()
+        if stream.expect(',}') == '}':
+            return
+
+
+def _metadata_only(body):
+    ''' reduce object or list to metadata, as PartialObjectMetadata does '''
+    ret = dict((key, body[key]) for key in ('kind', 'apiVersion', 'metadata') if key in body)
+    if 'items' in body:
+        ret['items'] = [_metadata_only(item) for item in body.get('items') or []]
+    return ret
+
+
+def _project(obj, fields):
+    ''' copy only fields (traverse_dict paths) of the object, keeping its structure '''
+    ret = {}
+    for field in fields:
+        value = traverse_dict(obj, field, None)
+        if value is None:
+            continue
+        keys = field.split(':')
+        target = ret
+        for key in keys[:-1]:
+            target = target.setdefault(key, {})
+        target[keys[-1]] = value
+    return ret
+
+
+# field numbers of the core kinds messages, as in generated.proto of the
+# kubernetes api: number -> (json name, type). Types are scalars, message
+# names, [] prefix for repeated fields, map for string maps, inline for
+# messages embedded into the parent in json and skip for fields known, but
+# not decoded
+_PROTOBUF_SCHEMAS = {
+    'TypeMeta': {1: ('apiVersion', 'string'), 2: ('kind', 'string')},
+    'Unknown': {1: ('typeMeta', 'TypeMeta'), 2: ('raw', 'raw'), 3: ('contentEncoding', 'string'),
+                4: ('contentType', 'string')},
+    'ListMeta': {1: ('selfLink', 'string'), 2: ('resourceVersion', 'string'), 3: ('continue', 'string'),
+                 4: ('remainingItemCount', 'int')},
+    'ObjectMeta': {1: ('name', 'string'), 2: ('generateName', 'string'), 3: ('namespace', 'string'),
+                   4: ('selfLink', 'string'), 5: ('uid', 'string'), 6: ('resourceVersion', 'string'),
+                   7: ('generation', 'int'), 8: ('creationTimestamp', 'time'),
+                   9: ('deletionTimestamp', 'time'), 10: ('deletionGracePeriodSeconds', 'int'),
+                   11: ('labels', 'map'), 12: ('annotations', 'map'),
+                   13: ('ownerReferences', '[]OwnerReference'), 14: ('finalizers', '[]string'),
+                   15: ('clusterName', 'string'), 17: ('managedFields', 'skip')},
+    'OwnerReference': {1: ('kind', 'string'), 3: ('name', 'string'), 4: ('uid', 'string'),
+                       5: ('apiVersion', 'string'), 6: ('controller', 'bool'),
+                       7: ('blockOwnerDeletion', 'bool')},
+    'ObjectReference': {1: ('kind', 'string'), 2: ('namespace', 'string'), 3: ('name', 'string'),
+                        4: ('uid', 'string'), 5: ('apiVersion', 'string'),
+                        6: ('resourceVersion', 'string'), 7: ('fieldPath', 'string')},
+    'Pod': {1: ('metadata', 'ObjectMeta'), 2: ('spec', 'PodSpec'), 3: ('status', 'PodStatus')},
+    'PodList': {1: ('metadata', 'ListMeta'), 2: ('items', '[]Pod')},
+    'PodTemplateSpec': {1: ('metadata', 'ObjectMeta'), 2: ('spec', 'PodSpec')},
+    'PodSpec': {1: ('volumes', '[]Volume'), 2: ('containers', '[]Container'), 3: ('restartPolicy', 'string'),
+                4: ('terminationGracePeriodSeconds', 'int'), 5: ('activeDeadlineSeconds', 'int'),
+                6: ('dnsPolicy', 'string'), 7: ('nodeSelector', 'map'),
+                8: ('serviceAccountName', 'string'), 9: ('serviceAccount', 'string'),
+                10: ('nodeName', 'string'), 11: ('hostNetwork', 'bool'), 12: ('hostPID', 'bool'),
+                13: ('hostIPC', 'bool'), 14: ('securityContext', 'PodSecurityContext'),
+                15: ('imagePullSecrets', '[]LocalObjectReference'), 16: ('hostname', 'string'),
+                17: ('subdomain', 'string'), 19: ('schedulerName', 'string'),
+                20: ('initContainers', '[]Container'), 21: ('automountServiceAccountToken', 'bool'),
+                22: ('tolerations', '[]Toleration'), 24: ('priorityClassName', 'string'),
+                25: ('priority', 'int'), 27: ('shareProcessNamespace', 'bool'),
+                29: ('runtimeClassName', 'string'), 30: ('enableServiceLinks', 'bool'),
+                31: ('preemptionPolicy', 'string')},
+    'PodSecurityContext': {2: ('runAsUser', 'int'), 3: ('runAsNonRoot', 'bool'), 4: ('supplementalGroups', '[]int'),
+                           5: ('fsGroup', 'int'), 6: ('runAsGroup', 'int')},
+    'Toleration': {1: ('key', 'string'), 2: ('operator', 'string'), 3: ('value', 'string'),
+                   4: ('effect', 'string'), 5: ('tolerationSeconds', 'int')},
+    'Container': {1: ('name', 'string'), 2: ('image', 'string'), 3: ('command', '[]string'),
+                  4: ('args', '[]string'), 5: ('workingDir', 'string'), 6: ('ports', '[]ContainerPort'),
+                  7: ('env', '[]EnvVar'), 8: ('resources', 'ResourceRequirements'),
+                  9: ('volumeMounts', '[]VolumeMount'), 10: ('livenessProbe', 'Probe'),
+                  11: ('readinessProbe', 'Probe'), 13: ('terminationMessagePath', 'string'),
+                  14: ('imagePullPolicy', 'string'), 16: ('stdin', 'bool'), 17: ('stdinOnce', 'bool'),
+                  18: ('tty', 'bool'), 20: ('terminationMessagePolicy', 'string')},
+    'ContainerPort': {1: ('name', 'string'), 2: ('hostPort', 'int'), 3: ('containerPort', 'int'),
+                      4: ('protocol', 'string'), 5: ('hostIP', 'string')},
+    'EnvVar': {1: ('name', 'string'), 2: ('value', 'string'), 3: ('valueFrom', 'EnvVarSource')},
+    'EnvVarSource': {1: ('fieldRef', 'ObjectFieldSelector'), 3: ('configMapKeyRef', 'KeySelector'),
+                     4: ('secretKeyRef', 'KeySelector')},
+    'ObjectFieldSelector': {1: ('apiVersion', 'string'), 2: ('fieldPath', 'string')},
+    'KeySelector': {1: ('localObjectReference', 'inline:LocalObjectReference'), 2: ('key', 'string'),
+                    3: ('optional', 'bool')},
+    'Probe': {1: ('handler', 'inline:Handler'), 2: ('initialDelaySeconds', 'int'), 3: ('timeoutSeconds', 'int'),
+              4: ('periodSeconds', 'int'), 5: ('successThreshold', 'int'), 6: ('failureThreshold', 'int')},
+    'Handler': {1: ('exec', 'ExecAction'), 2: ('httpGet', 'HTTPGetAction'), 3: ('tcpSocket', 'TCPSocketAction')},
+    'ExecAction': {1: ('command', '[]string')},
+    'HTTPGetAction': {1: ('path', 'string'), 2: ('port', 'intorstring'), 3: ('host', 'string'),
+                      4: ('scheme', 'string'), 5: ('httpHeaders', '[]HTTPHeader')},
+    'HTTPHeader': {1: ('name', 'string'), 2: ('value', 'string')},
+    'TCPSocketAction': {1: ('port', 'intorstring'), 2: ('host', 'string')},
+    'ResourceRequirements': {1: ('limits', 'map:quantity'), 2: ('requests', 'map:quantity')},
+    'VolumeMount': {1: ('name', 'string'), 2: ('readOnly', 'bool'), 3: ('mountPath', 'string'),
+                    4: ('subPath', 'string'), 5: ('mountPropagation', 'string'), 6: ('subPathExpr', 'string')},
+    'Volume': {1: ('name', 'string'), 2: ('volumeSource', 'inline:VolumeSource')},
+    'VolumeSource': {1: ('hostPath', 'HostPathVolumeSource'), 2: ('emptyDir', 'EmptyDirVolumeSource'),
+                     6: ('secret', 'SecretVolumeSource'),
+                     10: ('persistentVolumeClaim', 'PersistentVolumeClaimVolumeSource'),
+                     19: ('configMap', 'ConfigMapVolumeSource')},
+    'HostPathVolumeSource': {1: ('path', 'string'), 2: ('type', 'string')},
+    'EmptyDirVolumeSource': {1: ('medium', 'string'), 2: ('sizeLimit', 'quantity')},
+    'SecretVolumeSource': {1: ('secretName', 'string'), 2: ('items', '[]KeyToPath'), 3: ('defaultMode', 'int'),
+                           4: ('optional', 'bool')},
+    'ConfigMapVolumeSource': {1: ('localObjectReference', 'inline:LocalObjectReference'),
+                              2: ('items', '[]KeyToPath'), 3: ('defaultMode', 'int'), 4: ('optional', 'bool')},
+    'PersistentVolumeClaimVolumeSource': {1: ('claimName', 'string'), 2: ('readOnly', 'bool')},
+    'LocalObjectReference': {1: ('name', 'string')},
+    'KeyToPath': {1: ('key', 'string'), 2: ('path', 'string'), 3: ('mode', 'int')},
+    'PodStatus': {1: ('phase', 'string'), 2: ('conditions', '[]PodCondition'), 3: ('message', 'string'),
+                  4: ('reason', 'string'), 5: ('hostIP', 'string'), 6: ('podIP', 'string'),
+                  7: ('startTime', 'time'), 8: ('containerStatuses', '[]ContainerStatus'),
+                  9: ('qosClass', 'string'), 11: ('nominatedNodeName', 'string')},
+    'PodCondition': {1: ('type', 'string'), 2: ('status', 'string'), 3: ('lastProbeTime', 'time'),
+                     4: ('lastTransitionTime', 'time'), 5: ('reason', 'string'), 6: ('message', 'string')},
+    'ContainerStatus': {1: ('name', 'string'), 2: ('state', 'ContainerState'), 3: ('lastState', 'ContainerState'),
+                        4: ('ready', 'bool'), 5: ('restartCount', 'int'), 6: ('image', 'string'),
+                        7: ('imageID', 'string'), 8: ('containerID', 'string'), 9: ('started', 'bool')},
+    'ContainerState': {1: ('waiting', 'ContainerStateWaiting'), 2: ('running', 'ContainerStateRunning'),
+                       3: ('terminated', 'ContainerStateTerminated')},
+    'ContainerStateWaiting': {1: ('reason', 'string'), 2: ('message', 'string')},
+    'ContainerStateRunning': {1: ('startedAt', 'time')},
+    'ContainerStateTerminated': {1: ('exitCode', 'int'), 2: ('signal', 'int'), 3: ('reason', 'string'),
+                                 4: ('message', 'string'), 5: ('startedAt', 'time'), 6: ('finishedAt', 'time'),
+                                 7: ('containerID', 'string')},
+    'Node': {1: ('metadata', 'ObjectMeta'), 2: ('spec', 'NodeSpec'), 3: ('status', 'NodeStatus')},
+    'NodeList': {1: ('metadata', 'ListMeta'), 2: ('items', '[]Node')},
+    'NodeSpec': {1: ('podCIDR', 'string'), 2: ('externalID', 'string'), 3: ('providerID', 'string'),
+                 4: ('unschedulable', 'bool'), 5: ('taints', '[]Taint'), 7: ('podCIDRs', '[]string')},
+    'Taint': {1: ('key', 'string'), 2: ('value', 'string'), 3: ('effect', 'string'), 4: ('timeAdded', 'time')},
+    'NodeStatus': {1: ('capacity', 'map:quantity'), 2: ('allocatable', 'map:quantity'),
+                   3: ('phase', 'string'), 4: ('conditions', '[]NodeCondition'),
+                   5: ('addresses', '[]NodeAddress'), 6: ('daemonEndpoints', 'NodeDaemonEndpoints'),
+                   7: ('nodeInfo', 'NodeSystemInfo'), 8: ('images', 'skip')},
+    'NodeDaemonEndpoints': {1: ('kubeletEndpoint', 'DaemonEndpoint')},
+    'DaemonEndpoint': {1: ('Port', 'int')},
+    'NodeCondition': {1: ('type', 'string'), 2: ('status', 'string'), 3: ('lastHeartbeatTime', 'time'),
+                      4: ('lastTransitionTime', 'time'), 5: ('reason', 'string'), 6: ('message', 'string')},
+    'NodeAddress': {1: ('type', 'string'), 2: ('address', 'string')},
+    'NodeSystemInfo': {1: ('machineID', 'string'), 2: ('systemUUID', 'string'), 3: ('bootID', 'string'),
+                       4: ('kernelVersion', 'string'), 5: ('osImage', 'string'),
+                       6: ('containerRuntimeVersion', 'string'), 7: ('kubeletVersion', 'string'),
+                       8: ('kubeProxyVersion', 'string'), 9: ('operatingSystem', 'string'),
+                       10: ('architecture', 'string')},
+    'Namespace': {1: ('metadata', 'ObjectMeta'), 2: ('spec', 'NamespaceSpec'), 3: ('status', 'NamespaceStatus')},
+    'NamespaceList': {1: ('metadata', 'ListMeta'), 2: ('items', '[]Namespace')},
+    'NamespaceSpec': {1: ('finalizers', '[]string')},
+    'NamespaceStatus': {1: ('phase', 'string')},
+    'ReplicationController': {1: ('metadata', 'ObjectMeta'), 2: ('spec', 'ReplicationControllerSpec'),
+                              3: ('status', 'ReplicationControllerStatus')},
+    'ReplicationControllerList': {1: ('metadata', 'ListMeta'), 2: ('items', '[]ReplicationController')},
+    'ReplicationControllerSpec': {1: ('replicas', 'int'), 2: ('selector', 'map'),
+                                  3: ('template', 'PodTemplateSpec'), 4: ('minReadySeconds', 'int')},
+    'ReplicationControllerStatus': {1: ('replicas', 'int'), 2: ('observedGeneration', 'int'),
+                                    3: ('fullyLabeledReplicas', 'int'), 5: ('readyReplicas', 'int'),
+                                    6: ('availableReplicas', 'int')},
+    'Service': {1: ('metadata', 'ObjectMeta'), 2: ('spec', 'ServiceSpec'), 3: ('status', 'ServiceStatus')},
+    'ServiceList': {1: ('metadata', 'ListMeta'), 2: ('items', '[]Service')},
+    'ServiceSpec': {1: ('ports', '[]ServicePort'), 2: ('selector', 'map'), 3: ('clusterIP', 'string'),
+                    4: ('type', 'string'), 5: ('externalIPs', '[]string'), 7: ('sessionAffinity', 'string'),
+                    8: ('loadBalancerIP', 'string'), 9: ('loadBalancerSourceRanges', '[]string'),
+                    10: ('externalName', 'string'), 11: ('externalTrafficPolicy', 'string'),
+                    12: ('healthCheckNodePort', 'int'), 13: ('publishNotReadyAddresses', 'bool')},
+    'ServicePort': {1: ('name', 'string'), 2: ('protocol', 'string'), 3: ('port', 'int'),
+                    4: ('targetPort', 'intorstring'), 5: ('nodePort', 'int')},
+    'ServiceStatus': {1: ('loadBalancer', 'LoadBalancerStatus')},
+    'LoadBalancerStatus': {1: ('ingress', '[]LoadBalancerIngress')},
+    'LoadBalancerIngress': {1: ('ip', 'string'), 2: ('hostname', 'string')},
+    'Event': {1: ('metadata', 'ObjectMeta'), 2: ('involvedObject', 'ObjectReference'), 3: ('reason', 'string'),
+              4: ('message', 'string'), 5: ('source', 'EventSource'), 6: ('firstTimestamp', 'time'),
+              7: ('lastTimestamp', 'time'), 8: ('count', 'int'), 9: ('type', 'string'),
+              10: ('eventTime', 'microtime'), 12: ('action', 'string'),
+              14: ('reportingComponent', 'string'), 15: ('reportingInstance', 'string')},
+    'EventList': {1: ('metadata', 'ListMeta'), 2: ('items', '[]Event')},
+    'EventSource': {1: ('component', 'string'), 2: ('host', 'string')},
+    'Secret': {1: ('metadata', 'ObjectMeta'), 2: ('data', 'map:bytes'), 3: ('type', 'string'),
+               5: ('immutable', 'bool')},
+    'SecretList': {1: ('metadata', 'ListMeta'), 2: ('items', '[]Secret')},
+}
+# kinds requested in protobuf
+PROTOBUF_KINDS = ('pods', 'nodes', 'namespaces', 'replicationcontrollers', 'services', 'events', 'secrets')
+
+
+def _pb_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = ord(data[pos])
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _pb_fields(data):
+    ''' iterate over (field number, wire type, value) of protobuf message '''
+    pos = 0
+    while pos < len(data):
+        key, pos = _pb_varint(data, pos)
+        wire = key & 7
+        if wire == 0:
+            value, pos = _pb_varint(data, pos)
+        elif wire == 2:
+            size, pos = _pb_varint(data, pos)
+            value, pos = data[pos:pos + size], pos + size
+        elif wire == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire == 5:
+            value, pos = data[pos:pos + 4], pos + 4
+        else:
+            raise ValueError("unsupported protobuf wire type {0}".format(wire))
+        if pos > len(data):
+            raise ValueError("truncated protobuf message")
+        yield key >> 3, wire, value
+
+
+def _pb_time(data, micro=False):
+    ''' format Time or MicroTime message as json does '''
+    fields = dict((number, value) for number, _, value in _pb_fields(data))
+    stamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(fields.get(1, 0)))
+    if micro:
+        return '{0}.{1:06d}Z'.format(stamp, fields.get(2, 0) // 1000)
+    return stamp + 'Z'
+
+
+class _ProtobufDecoder(object):
+    """ decode messages into the dicts json api returns, unknown gets the
+    paths (traverse_dict ones) of the messages fields were not decoded of,
+    because they are missing in _PROTOBUF_SCHEMAS or skipped """
+
+    def __init__(self):
+        self.unknown = set()
+
+    def message(self, data, name, path=''):
+        """ decode the message of the schema into dict, path names the field for unknown """
+        schema = _PROTOBUF_SCHEMAS[name]
+        obj = {}
+        for number, wire, value in _pb_fields(data):
+            if number not in schema:
+                self.unknown.add(path)
+                continue
+            key, kind = schema[number]
+            inner = '{0}:{1}'.format(path, key) if path else key
+            if kind == 'skip':
+                self.unknown.add(inner)
+            elif kind.startswith('inline:'):
+                obj.update(self.message(value, kind.partition(':')[2], path))
+            elif kind.startswith('map'):
+                entry = dict((i, v) for i, _, v in _pb_fields(value))
+                obj.setdefault(key, {})[entry.get(1, '').decode('utf-8')] = \
+                    self.value(entry.get(2, ''), kind.partition(':')[2] or 'string', inner)
+            elif kind.startswith('[]'):
+                obj.setdefault(key, []).append(self.value(value, kind[2:], inner))
+            else:
+                # json omits empty strings
+                if value or kind != 'string':
+                    obj[key] = self.value(value, kind, inner)
+        return obj
+
+    def value(self, value, kind, path=''):
+        """ decode the field value of the kind """
+        if kind == 'string':
+            return value.decode('utf-8')
+        elif kind == 'bytes':
+            return base64.b64encode(value)
+        elif kind == 'raw':
+            return value
+        elif kind == 'int':
+            # negative numbers are sent as 64 bit two's complement
+            return value - (1 << 64) if value >= 1 << 63 else value
+        elif kind == 'bool':
+            return bool(value)
+        elif kind in ('time', 'microtime'):
+            return _pb_time(value, kind == 'microtime')
+        elif kind == 'quantity':
+            return dict((i, v) for i, _, v in _pb_fields(value)).get(1, '').decode('utf-8')
+        elif kind == 'intorstring':
+            fields = dict((i, v) for i, _, v in _pb_fields(value))
+            return fields.get(3, '').decode('utf-8') if fields.get(1) else self.value(fields.get(2, 0), 'int')
+        return self.message(value, kind, path)
+
+
+def _decode_protobuf(data):
+    ''' decode kubernetes protobuf envelope (magic and runtime.Unknown holding
+    the object), returns the object dict and paths of its messages having
+    fields unknown to the decoder, see _ProtobufDecoder '''
+    if not data.startswith(PROTOBUF_MAGIC):
+        raise ValueError("not a kubernetes protobuf message")
+    decoder = _ProtobufDecoder()
+    unknown = decoder.message(data[len(PROTOBUF_MAGIC):], 'Unknown')
+    kind = traverse_dict(unknown, 'typeMeta:kind', '')
+    if unknown.get('contentEncoding') or kind not in _PROTOBUF_SCHEMAS:
+        raise ValueError("unsupported protobuf content {0}".format(kind))
+    obj = decoder.message(unknown.get('raw', ''), kind)
+    obj['kind'] = kind
+    obj['apiVersion'] = traverse_dict(unknown, 'typeMeta:apiVersion', 'v1')
+    return obj, decoder.unknown
+
+
+class _RateLimiter(object):
+    """ token bucket shared by the processes of the host through the state
+    file locked with flock, reserve returns seconds to wait for the token.
+    Without fcntl, or with shared=False, the bucket is shared by the threads
+    of the process only, so the IOLoop thread never waits for the lock """
+
+    def __init__(self, key, qps, burst):
+        self.qps = qps
+        self.burst = max(burst, 1)
+        self.filename = os.path.join(_cache_dir('ratelimit'), hashlib.sha1(key).hexdigest())
+        self.lock = threading.Lock()
+        self.tokens = float(self.burst)
+        self.updated = time.time()
+
+    def _take(self, tokens, updated):
+        now = time.time()
+        tokens = min(self.burst, tokens + max(now - updated, 0) * self.qps) - 1
+        return tokens, now, max(-tokens / self.qps, 0)
+
+    def reserve(self, shared=True):
+        """ take a token, returns seconds to wait for it """
+        with self.lock:
+            if not HAS_FCNTL or not shared:
+                self.tokens, self.updated, delay = self._take(self.tokens, self.updated)
+                return delay
+            fd = os.open(self.filename, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    tokens, updated = [float(i) for i in os.read(fd, 64).split()]
+                except ValueError:
+                    # new or damaged state, start with full bucket
+                    tokens, updated = float(self.burst), time.time()
+                tokens, updated, delay = self._take(tokens, updated)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, '{0!r} {1!r}'.format(tokens, updated))
+                return delay
+            finally:
+                os.close(fd)
+
+
+# rate limiters per api server, shared by the clients of the process
+_LIMITERS = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def _get_limiter(api_server):
+    ''' get rate limiter of the api server or None if limiting is disabled '''
+    qps = float(_get_opt('k8s.qps', 0))
+    if qps <= 0:
+        return None
+    burst = int(_get_opt('k8s.burst', 100))
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(api_server)
+        if limiter is None or (limiter.qps, limiter.burst) != (qps, max(burst, 1)):
+            limiter = _LIMITERS[api_server] = _RateLimiter(api_server, qps, burst)
+        return limiter
+
+
+def _parse_json(content):
+    ''' decode JSON documents following each other, e.g. one per line '''
+    decoder = json.JSONDecoder()
+    documents = []
+    pos = 0
+    while True:
+        while pos < len(content) and content[pos] in ' \t\r\n':
+            pos += 1
+        if pos == len(content):
+            return documents
+        document, pos = decoder.raw_decode(content, pos)
+        documents.append(document)
+
+
+def _parse_yaml(content):
+    ''' decode YAML documents, with LibYAML if it is installed '''
+    return list(yaml.load_all(content, Loader=YamlLoader))
+
+
+def _manifest_engine(content, filename=''):
+    ''' name of the parser for the manifest by its extension or first character '''
+    if os.path.splitext(filename)[1].lower() == '.json' or content.lstrip()[:1] in ('{', '['):
+        return 'json'
+    return 'yaml'
+
+
+def _iter_manifest(f, filename=''):
+    ''' yield documents of the manifest file one by one as they are parsed '''
+    if _manifest_engine(f.read(1024), filename) == 'json':
+        f.seek(0)
+        stream = _JSONStream(iter(lambda: f.read(JSON_CHUNK_SIZE), ''))
+        parsed = 0
+        try:
+            while True:
+                try:
+                    stream.peek()
+                except ValueError:
+                    # end of the file
+                    return
+                document = stream.value()
+                parsed += 1
+                yield document
+        except ValueError:
+            if parsed:
+                raise
+    # YAML or JSON json module refuses
+    f.seek(0)
+    for document in yaml.load_all(f, Loader=YamlLoader):
+        yield document
+
+
+def _stream_manifest(filename):
+    ''' yield documents of the manifest while the next ones are parsed by
+    another thread, up to k8s.manifest_queue_size of them wait in memory.
+    Raises ValueError once the file is missing or a document can't be parsed '''
+    if not filename or not os.path.isfile(filename):
+        log.error("path %s is not file", filename)
+        raise ValueError("path {0} is not file".format(filename))
+    documents = queue.Queue(maxsize=max(int(_get_opt('k8s.manifest_queue_size', 16)), 1))
+    stopped = threading.Event()
+    end = object()
+
+    def put(document):
+        ''' queue the document, returns False once the consumer stopped '''
+        while not stopped.is_set():
+            try:
+                documents.put(document, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        ''' parse the manifest in the thread and queue its documents '''
+        try:
+            with open(filename, 'rb') as f:
+                for document in _iter_manifest(f, filename):
+                    if isinstance(document, six.string_types):
+                        log.error("expected manifest data, but got plaintext: %s", document)
+                    elif not put(document):
+                        return
+        except yaml.YAMLError as exc:
+            log.error("yaml can't be loaded due to error: [%s]", exc)
+            put(ValueError("yaml can't be loaded due to error: [{0}]".format(exc)))
+        except Exception as exp:  # pylint: disable=broad-except
+            log.error("manifest file %s is neither yaml nor json file or format is wrong: %s", filename, exp)
+            put(ValueError("manifest file {0} is neither yaml nor json file or format is wrong: {1}".format(
+                filename, exp)))
+        put(end)
+
+    producer = threading.Thread(target=produce, name='k8s-manifest')
+    producer.daemon = True
+    producer.start()
+    try:
+        while True:
+            document = documents.get()
+            if document is end:
+                return
+            if isinstance(document, ValueError):
+                # documents before the error are applied already
+                raise document
+            yield document
+    finally:
+        # consumer is done, e.g. failed, producer must not wait for it
+        stopped.set()
+
+
+class _ManifestCache(object):
+    ''' parsed manifests per file, kept marshaled so each load gets objects of
+    its own. Unchanged inode, size and mtime return the memory copy without
+    reading the file, otherwise the content digest decides whether the copy
+    in memory or on disk is still the parsed content. marshal does not run
+    code on load unlike pickle, and the disk copy is trusted only in the
+    private cache directory '''
+
+    def __init__(self):
+        # realpath -> (stat identity, digest, marshal), least recently used first
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def load(self, filename, parse):
+        ''' get manifest of the file, parse(content, filename) returns the
+        manifest and whether it was parsed without errors '''
+        path = os.path.realpath(filename)
+        stat = os.stat(path)
+        identity = (stat.st_ino, stat.st_size, stat.st_mtime)
+        size = int(_get_opt('k8s.manifest_cache_size', 256))
+        with self.lock:
+            entry = self.entries.pop(path, None)
+            if entry is not None and entry[0] == identity:
+                self.entries[path] = entry
+                return marshal.loads(entry[2])
+        with open(path, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha1(content).hexdigest()
+        saved = None
+        if _get_opt('k8s.manifest_cache_disk', True):
+            directory = _cache_dir('manifests')
+            if _is_private_dir(directory):
+                saved = os.path.join(directory, hashlib.sha1(path).hexdigest())
+            else:
+                log.warning("not using manifest cache in %s, it is not private to the user", directory)
+        if size <= 0 and saved is None:
+            return parse(content, filename)[0]
+        if entry is None and saved:
+            try:
+                with open(saved, 'rb') as f:
+                    entry = marshal.loads(f.read())
+            except (IOError, EOFError, ValueError, TypeError):
+                entry = None
+        if isinstance(entry, tuple) and len(entry) == 3 and entry[1] == digest:
+            blob = entry[2]
+        else:
+            log.debug("loading manifest %s", filename)
+            manifest, parsed = parse(content, filename)
+            if not parsed:
+                # errors are logged again by the next load
+                return manifest
+            try:
+                blob = marshal.dumps(manifest)
+            except ValueError:
+                # e.g. timestamps of yaml, such manifest is parsed on every load
+                return manifest
+        entry = (identity, digest, blob)
+        if saved:
+            tmp = '{0}.{1}'.format(saved, os.getpid())
+            try:
+                fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(marshal.dumps(entry))
+                os.rename(tmp, saved)
+            except (IOError, OSError) as exp:
+                log.debug("could not save parsed manifest %s: %s", filename, exp)
+        if size > 0:
+            with self.lock:
+                self.entries[path] = entry
+                while len(self.entries) > size:
+                    self.entries.popitem(last=False)
+        return marshal.loads(blob)
+
+
+# parsed manifests shared by the clients of the process
+_MANIFESTS = _ManifestCache()
+
+
+class Kubernetes(object):
+
+    def __init__(self, kubeconfig="", context_name=""):
+        self.context_name = context_name
+        self.kubeconfig = kubeconfig
+        # namespace names seeded by single LIST, see namespace_exists
+        self.known_namespaces = None
+        self.namespaces_ttl = float(_get_opt('k8s.namespace_cache_ttl', 300))
+        self.namespaces_expire = 0
+        # alias -> api resource, see discovery
+        self.resources = None
+        self.resources_ttl = float(_get_opt('k8s.discovery_ttl', 600))
+        self.resources_expire = 0
+        self.discovery_lock = threading.RLock()
+        self.pool_maxsize = int(_get_opt('k8s.pool_maxsize', 10))
+        self.pool_idle_timeout = float(_get_opt('k8s.pool_idle_timeout', 60))
+        self.timeout = float(_get_opt('k8s.timeout', 30))
+        self.page_size = int(_get_opt('k8s.page_size', 500))
+        self.compression = bool(_get_opt('k8s.compression', True))
+        self.protobuf = bool(_get_opt('k8s.protobuf', False))
+        # kinds read in json, as their objects have fields unknown to the decoder
+        self.protobuf_partial = set()
+        self.session = None
+        self.last_used = 0
+        self.async_k8s = None
+        self.retry_max = int(_get_opt('k8s.retry_max', 5))
+        self.retry_backoff = float(_get_opt('k8s.retry_backoff', 0.5))
+        self.retry_max_delay = float(_get_opt('k8s.retry_max_delay', 30))
+        self.retry_budget = int(_get_opt('k8s.retry_budget', 20))
+        # requests sent, repeated, coalesced with in-flight identical GET and
+        # answered from the informer or memo instead, see client_stats
+        self.stats = {'requests': 0, 'retries': 0, 'coalesced': 0, 'cached': 0,
+                      # response bodies as received and after decompression
+                      'bytes_wire': 0, 'bytes_decoded': 0}
+        # workers of the run update the counters at once
+        self.stats_lock = threading.Lock()
+        # (path, params) -> _Flight of GET in progress
+        self.inflight = {}
+        self.inflight_lock = threading.Lock()
+        # run, depth of with blocks and of uncached blocks of the thread, the
+        # client is shared by the threads running states at once
+        self.local = threading.local()
+        # (api, kind) -> _Informer, see informer
+        self.informed_kinds = set(KIND_ALIASES.get(i.lower(), i.lower()) for i in _get_opt('k8s.informers', []) or [])
+        self.informers = {}
+        self.informers_lock = threading.Lock()
+        # client is owned by the registry in _get_client and outlives the with block
+        self.shared = False
+        self.get_auth()
+
+    def __enter__(self):
+        # nested helpers called without k8s= pick this client up, see _get_client
+        if not self.run_depth:
+            self.start_run()
+        self.local.depth = self.run_depth + 1
+        _get_ambient_clients().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _get_ambient_clients().pop()
+        self.local.depth = self.run_depth - 1
+        if not self.run_depth:
+            self.memo.clear()
+            # nested with blocks keep using the connections
+            if not self.shared:
+                self.close()
+
+    @property
+    def run(self):
+        ''' _Run of the thread, the one out of with block has a retry budget
+        for the life of the thread '''
+        if getattr(self.local, 'run', None) is None:
+            self.local.run = _Run(self.retry_budget)
+        return self.local.run
+
+    @property
+    def run_depth(self):
+        ''' number of nested with blocks of the thread '''
+        return getattr(self.local, 'depth', 0)
+
+    @property
+    def memo_bypass(self):
+        ''' number of nested uncached blocks of the thread '''
+        return getattr(self.local, 'bypass', 0)
+
+    @property
+    def memo(self):
+        ''' responses memoized during the run of the thread '''
+        return self.run.memo
+
+    def start_run(self):
+        ''' reset per run state, run is the outermost with block of the thread '''
+        self.local.run = _Run(self.retry_budget)
+
+    @contextlib.contextmanager
+    def joined(self, run):
+        ''' make the thread, e.g. a worker of the pool, take part in the run
+        of another thread, sharing its memo and retry budget '''
+        previous = self.local.__dict__.copy()
+        self.local.run, self.local.depth, self.local.bypass = run, 1, 0
+        _get_ambient_clients().append(self)
+        try:
+            yield self
+        finally:
+            _get_ambient_clients().pop()
+            self.local.__dict__.clear()
+            self.local.__dict__.update(previous)
+
+    @contextlib.contextmanager
+    def uncached(self):
+        ''' make GETs of the block of the thread to reach the api server, for
+        polling loops waiting for changes made by others '''
+        self.local.bypass = self.memo_bypass + 1
+        try:
+            yield self
+        finally:
+            self.local.bypass = self.memo_bypass - 1
+
+    @staticmethod
+    def _memo_key(path, data):
+        return '/' + path.strip('/'), tuple(sorted(six.iteritems(data or {})))
+
+    def memo_get(self, path, data=None):
+        ''' get copy of the body memoized during the run, None if there is none '''
+        if not self.run_depth or self.memo_bypass:
+            return None
+        body = self.memo.get(self._memo_key(path, data))
+        return copy.deepcopy(body) if body is not None else None
+
+    def memo_put(self, path, data, body):
+        ''' memoize the response during the run '''
+        if self.run_depth:
+            self.memo[self._memo_key(path, data)] = copy.deepcopy(body)
+
+    def memo_listed(self, path, data=None):
+        ''' get copy of the object out of the list of its collection memoized
+        during the run, None if there is no such list. Raises LookupError if
+        the list does not have the object '''
+        body, name = self._memo_list(path, data)
+        if body is None:
+            return None
+        for item in body.get('items') or []:
+            if traverse_dict(item, 'metadata:name', None) == name:
+                return self._list_item(body, item)
+        self.count('cached')
+        raise LookupError
+
+    def listed_absent(self, path):
+        ''' whether the object is missing from the list of its collection
+        memoized during the run. The list is taken before the writes of
+        others, e.g. controllers, so the absence is a hint only '''
+        body, name = self._memo_list(path, None)
+        return body is not None and not any(traverse_dict(item, 'metadata:name', None) == name
+                                            for item in body.get('items') or [])
+
+    def _memo_list(self, path, data):
+        ''' list of the collection of the object memoized during the run and
+        name of the object, (None, None) if there is no such list '''
+        if data or not self.run_depth or self.memo_bypass:
+            return None, None
+        path = '/' + path.strip('/')
+        match = INFORMED_PATH.match(path)
+        if not match or not match.group('name'):
+            return None, None
+        collection = path.rpartition('/')[0]
+        return self.memo.get(self._memo_key(collection, None)), match.group('name')
+
+    @staticmethod
+    def _list_item(body, item):
+        ''' copy of the list item as GET of the object returns it '''
+        kind = body.get('kind', '')
+        item = copy.deepcopy(item)
+        if kind.endswith('List') and kind != 'List':
+            item.setdefault('kind', kind[:-len('List')])
+        if body.get('apiVersion'):
+            item.setdefault('apiVersion', body['apiVersion'])
+        return item
+
+    def prefetch(self, paths):
+        ''' LIST the collections at once and memoize them with their objects
+        for the run, so GETs of objects of the collections need no request,
+        whether the object is there or missing '''
+        if not self.run_depth:
+            return
+        paths = [i for i in set(paths) if self._memo_key(i, None) not in self.memo]
+        for path, body in zip(paths, self.gather([('get', (i,)) for i in paths])):
+            if isinstance(body, Exception):
+                # e.g. user is not allowed to list, objects are read one by one
+                log.debug("could not prefetch %s: %s", path, body)
+                continue
+            self.memo_put(path, None, body)
+            for item in body.get('items') or []:
+                name = traverse_dict(item, 'metadata:name', None)
+                if name:
+                    self.memo_put('{0}/{1}'.format(path.rstrip('/'), name), None, self._list_item(body, item))
+
+    def forget(self, path):
+        ''' drop memoized GETs a write to the path could change: the object,
+        lists of its kind and everything below it '''
+        path = '/' + path.strip('/')
+        match = INFORMED_PATH.match(path)
+        while not match and path.count('/') > 1:
+            # subresource, e.g. pods/name/eviction
+            path = os.path.dirname(path)
+            match = INFORMED_PATH.match(path)
+        for key in list(self.memo):
+            entry = key[0]
+            if entry == path or entry.startswith(path + '/'):
+                self.memo.pop(key, None)
+                continue
+            other = INFORMED_PATH.match(entry)
+            if match and other and other.group('api', 'kind') == match.group('api', 'kind') and \
+                    (not other.group('name') or not match.group('name') or
+                     other.group('namespace', 'name') == match.group('namespace', 'name')):
+                self.memo.pop(key, None)
+
+    def count(self, name, value=1):
+        ''' add value to the counter of client_stats '''
+        with self.stats_lock:
+            self.stats[name] += value
+
+    def report(self, ret):
+        ''' add number of retried requests to the state return, only outermost
+        with block of the run reports '''
+        if self.run.retries and isinstance(ret, dict) and _get_ambient_clients().count(self) == 1:
+            ret['comment'] = '{0} ({1} API requests retried)'.format(ret.get('comment', ''),
+                                                                    self.run.retries).strip()
+        return ret
+
+    def retry_delay(self, method, attempt, code=None, retry_after=None,
+                    connect_error=False, error=False):
+        ''' get seconds to wait before next attempt of the request or None if
+        the request must not be repeated. Rejected (429) and never sent requests
+        are repeated for any verb, server errors and broken connections only
+        for idempotent verbs, as non-idempotent ones could be processed already '''
+        if attempt >= self.retry_max or self.run.retry_budget <= 0:
+            return None
+        if code == 429 or connect_error:
+            pass
+        elif (code in RETRY_CODES or error) and method in IDEMPOTENT_METHODS:
+            pass
+        else:
+            return None
+
+        # exponential backoff with full jitter
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_backoff * 2 ** attempt))
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.retry_max_delay))
+            except ValueError:
+                # HTTP-date format is not used by kubernetes
+                pass
+        with self.stats_lock:
+            if self.run.retry_budget <= 0:
+                return None
+            self.run.retry_budget -= 1
+            self.run.retries += 1
+            self.stats['retries'] += 1
+        log.info("retrying %s request in %.2f seconds, attempt %s", method, delay, attempt + 1)
+        return delay
+
+    def throttle(self, shared=True):
+        ''' reserve a request of the rate limit, returns seconds to wait before
+        the request is sent '''
+        limiter = _get_limiter(self.api_server)
+        if limiter is None:
+            return 0
+        delay = limiter.reserve(shared)
+        if delay:
+            log.debug("request throttled for %.2f seconds", delay)
+        return delay
+
+    def informer(self, api, kind):
+        ''' get synced informer of the kind, informers are used by long living
+        clients of the process wide registry only '''
+        if not self.shared or kind not in self.informed_kinds:
+            return None
+        with self.informers_lock:
+            informer = self.informers.get((api, kind))
+            if informer is None or not informer.alive():
+                informer = _Informer(self.kubeconfig, self.context_name, '/{0}/{1}'.format(api, kind))
+                try:
+                    informer.start()
+                except Exception as exp:  # pylint: disable=broad-except
+                    # e.g. user is not allowed to list or watch the kind
+                    log.warning("could not start informer of %s, requests are made instead: %s", kind, exp)
+                    self.informed_kinds.discard(kind)
+                    return None
+                self.informers[(api, kind)] = informer
+        return informer if informer.synced else None
+
+    def informed_get(self, path, data=None):
+        ''' get object or list out of the informer, None if the kind is not
+        informed or the query can't be answered locally '''
+        match = INFORMED_PATH.match(path) if self.informed_kinds else None
+        if not match:
+            return None
+        informer = self.informer(match.group('api'), match.group('kind'))
+        if informer is None:
+            return None
+        return informer.lookup(match.group('namespace'), match.group('name'), data)
+
+    def after_write(self, path, body, deleted=False):
+        ''' forget memoized GETs of the path and apply the result of the write
+        to the informer, so subsequent reads see it before the watch event arrives '''
+        if self.memo:
+            self.forget(path)
+        match = INFORMED_PATH.match(path) if self.informers else None
+        if not match:
+            return
+        informer = self.informers.get((match.group('api'), match.group('kind')))
+        if informer is None:
+            return
+        if body.get('kind') != 'Status':
+            informer.update(body)
+        elif deleted and match.group('name'):
+            informer.discard(match.group('namespace'), match.group('name'))
+
+    def close(self):
+        ''' close connection pool '''
+        with self.informers_lock:
+            for informer in self.informers.values():
+                informer.stop()
+            self.informers = {}
+        self.close_session()
+        if self.async_k8s is not None:
+            self.async_k8s.close()
+            self.async_k8s = None
+
+    def async_client(self):
+        ''' get AsyncKubernetes client for the same kubeconfig and context '''
+        if self.async_k8s is None:
+            self.async_k8s = AsyncKubernetes(self.kubeconfig, self.context_name)
+            self.async_k8s.owner = self
+            self.async_k8s.stats = self.stats
+        return self.async_k8s
+
+    def gather(self, calls, concurrency=None):
+        ''' make independent requests (verb, args) as one concurrent wave,
+        returns bodies or exceptions in the same order '''
+        return self.async_client().gather(calls, concurrency)
+
+    def guess_api_version(self, kind):
+        ''' apiVersion of the kind as discovered, e.g. v1 or extensions/v1beta1 '''
+        resource = self.resource(kind)
+        if resource is None:
+            return 'extensions/v1beta1'
+        return '/'.join(filter(None, [resource['group'], resource['version']]))
+
+    @staticmethod
+    def load_manifest(filename, cache=True):
+        """ load manifest in yaml or json format into the dictionary or array of dictionaries
+        support multiple documents in single file, unchanged files are not parsed again
+        unless cache is False, e.g. for files holding credentials """
+        if not filename:
+            return {}
+        if not os.path.isfile(filename):
+            log.error("path %s is not file", filename)
+            return {}
+        if not cache:
+            with open(filename, 'rb') as f:
+                return Kubernetes.parse_manifest(f.read(), filename)[0]
+        return _MANIFESTS.load(filename, Kubernetes.parse_manifest)
+
+    @staticmethod
+    def parse_manifest(content, filename):
+        """ parse manifest content, see load_manifest, returns it and whether
+        it was parsed without errors. JSON is decoded by json module, YAML
+        and JSON json module refuses by LibYAML if it is installed """
+        data = []
+        parsed = True
+        try:
+            if _manifest_engine(content, filename) == 'json':
+                try:
+                    documents = _parse_json(content)
+                except ValueError:
+                    documents = _parse_yaml(content)
+            else:
+                documents = _parse_yaml(content)
+            for i in documents:
+                if isinstance(i, six.string_types):
+                    log.error("expected manifest data, but got plaintext: %s", i)
+                    parsed = False
+                else:
+                    data.append(i)
+        except yaml.YAMLError as exc:
+            log.error("yaml can't be loaded due to error: [%s]", exc)
+            parsed = False
+        if len(data) == 1:
+            return data[0], parsed
+        else:
+            return data, parsed
+
+    def _get_context(self):
+        """
+        Get the context info such as:
+            cluster info
+            user info
+        from kubeconfig file, if context_name is not set,
+        current-context will be used automatically.
+        """
+        # credentials of kubeconfig are never kept by the manifest cache
+        config = self.load_manifest(self.kubeconfig, cache=False)
+
+        if not self.context_name:
+            self.context_name = config.get('current-context')
+        log.debug('context name is: %s', self.context_name)
+
+        for i in config.get('contexts', []):
+            if i.get('name', '') == self.context_name:
+                context = i.get('context')
+                break
+        else:
+            return {}
+
+        cluster_name = context.get('cluster')
+        user_name = context.get('user')
+
+        for i in config.get('clusters', []):
+            if i.get('name', '') == cluster_name:
+                cluster = i.get('cluster', {})
+                log.trace("cluster info: %s", cluster)
+                break
+        else:
+            return {}
+
+        for i in config.get('users', []):
+            if i.get('name', '') == user_name:
+                user = i.get('user', {})
+                log.trace("user info: %s", cluster)
+                break
+        else:
+            return {}
+
+        return dictmerge(cluster, user)
+
+    def get_context_name(self):
+        return self.context_name
+
+    @staticmethod
+    def get_names(kobj):
+        """ get names out of any object received by kubernetes or array of objects"""
+        log.trace("got kubernetes object: %s", kobj)
+        names = []
+        if "items" in kobj:
+            for i in kobj.get("items", []):
+                name = traverse_dict(i, "metadata:name", None)
+                if name:
+                    names.append(name)
+        elif traverse_dict(kobj, "metadata:name", None):
+            names.append(traverse_dict(kobj, "metadata:name", None))
+        log.trace("got names: %s", names)
+        return names
+
+    @staticmethod
+    def get_labels(kobj, label_name=None):
+        '''Get all labels from a kube object.'''
+        if label_name:
+            return traverse_dict(kobj, "metadata:labels:{0}".format(label_name), None)
+        return traverse_dict(kobj, "metadata:labels", None)
+
+    @staticmethod
+    def get_ssl_context(context):
+        """ build ssl context out of kubeconfig context, certificate authority
+        is loaded from memory, client key pair is stored in a file private to
+        the user only while ssl module loads it """
+        if context.get('insecure-skip-tls-verify'):
+            ssl_context = ssl.create_default_context()
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+        elif 'certificate-authority-data' in context:
+            ca = base64.b64decode(context.get('certificate-authority-data', "")).decode('ascii')
+            ssl_context = ssl.create_default_context(cadata=ca)
+        elif 'certificate-authority' in context:
+            ssl_context = ssl.create_default_context(cafile=context.get('certificate-authority'))
+        else:
+            ssl_context = ssl.create_default_context()
+
+        if 'client-certificate-data' in context and 'client-key-data' in context:
+            # we have client certification auth
+            key_pair = '\n'.join([base64.b64decode(context.get('client-certificate-data', "")),
+                                  base64.b64decode(context.get('client-key-data', ""))])
+            with _credential_file(key_pair) as filename:
+                ssl_context.load_cert_chain(filename)
+        elif 'client-certificate' in context and 'client-key' in context:
+            ssl_context.load_cert_chain(context.get('client-certificate'), context.get('client-key'))
+        return ssl_context
+
+    def get_auth(self):
+        context = self._get_context()
+        self.auth = {}
+        self.ssl_context = None
+
+        self.api_server = context.get('server', 'http://127.0.0.1:8080')
+
+        if self.api_server.startswith('https'):
+            self.ssl_context = self.get_ssl_context(context)
+
+        # token and username/password are mutually exclusive
+        if 'token' in context:
+            self.auth.setdefault('header_dict', {})['Authorization'] = 'Bearer {0}'.format(context.get('token'))
+        elif 'username' in context and 'password' in context:
+            self.auth['username'] = context.get('username')
+            self.auth['password'] = context.get('password')
+
+        log.trace('kubernetes login information: %s', self.auth)
+        return self.auth
+
+    def url(self, path):
+        log.debug("generated url: %s", urljoin(self.api_server, path))
+        return urljoin(self.api_server, path)
+
+    def kind(self, kind):
+        """ generate normalized kind name out of user defined ones """
+        log.trace("Got object for normalization: %s", kind)
+        if isinstance(kind, bool):
+            # for some reason k8s.get no produces False as input
+            kind = "nodes"
+        else:
+            resource = self.resource(kind)
+            kind = resource['plural'] if resource else kind.lower()
+
+        log.trace("normalized object is: %s", kind)
+        return kind
+
+    def resource(self, kind):
+        ''' api resource of kind name or alias, None if unknown '''
+        alias = kind.lower()
+        resources = self.discovery()
+        plural = KIND_ALIASES.get(alias)
+        resource = resources.get(alias) or resources.get(plural)
+        if resource is None and plural:
+            api_version, namespaced, _ = STATIC_KINDS[plural]
+            resource = _resource(api_version, plural, namespaced)
+        return resource
+
+    def discovery(self):
+        ''' index of the api server resources by lowercase plural, singular,
+        kind and short names: dicts with group, version, plural and namespaced.
+        It is built out of /api and /apis once per discovery_ttl and shared
+        through the disk with other processes, empty if discovery failed '''
+        with self.discovery_lock:
+            if self.resources is None or time.time() > self.resources_expire:
+                self.resources, self.resources_expire = self.load_discovery()
+            return self.resources
+
+    def load_discovery(self):
+        ''' read resources saved on disk or discover them, returns them with
+        the time they expire. The disk copy is used out of the private cache
+        directory only '''
+        directory = _cache_dir('discovery')
+        filename = None
+        if _is_private_dir(directory):
+            filename = os.path.join(directory, hashlib.sha1(self.api_server).hexdigest())
+        else:
+            log.warning("not using discovery cache in %s, it is not private to the user", directory)
+        try:
+            if filename:
+                with open(filename, 'rb') as f:
+                    saved = json.load(f)
+                if saved['expire'] > time.time():
+                    return saved['resources'], saved['expire']
+        except (IOError, ValueError, KeyError, TypeError):
+            pass
+        expire = time.time() + self.resources_ttl
+        try:
+            resources = self.discover()
+        except Exception as exp:  # pylint: disable=broad-except
+            log.warning("could not discover api resources of %s: %s", self.api_server, exp)
+            return {}, expire
+        if not filename:
+            return resources, expire
+        tmp = '{0}.{1}'.format(filename, os.getpid())
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                json.dump({'expire': expire, 'resources': resources}, f, separators=(',', ':'))
+            os.rename(tmp, filename)
+        except (IOError, OSError) as exp:
+            log.warning("could not save api resources of %s: %s", self.api_server, exp)
+        return resources, expire
+
+    def discover(self):
+        ''' ask the api server for its resources, see discovery. Core ones
+        take precedence, then groups in the server order, each in the
+        preferred version '''
+        paths = ['/api/{0}'.format(version) for version in self.get('/api').get('versions', [])]
+        for group in self.get('/apis').get('groups', []):
+            if group.get('preferredVersion'):
+                paths.append('/apis/{0}'.format(group['preferredVersion']['groupVersion']))
+        resources = {}
+        for path in paths:
+            try:
+                body = self.get(path)
+            except Exception as exp:  # pylint: disable=broad-except
+                # e.g. aggregated api which is down
+                log.debug("could not discover %s: %s", path, exp)
+                continue
+            for item in body.get('resources', []):
+                if '/' in item['name']:
+                    # subresource, e.g. pods/log
+                    continue
+                resource = _resource(body['groupVersion'], item['name'], item.get('namespaced', True))
+                for alias in [item['name'], item.get('singularName'), item.get('kind')] + item.get('shortNames', []):
+                    if alias:
+                        resources.setdefault(alias.lower(), resource)
+        log.debug("discovered %s api resources of %s", len(resources), self.api_server)
+        return resources
+
+    @staticmethod
+    def is_dns_subdomain(name):
+        ''' Check that name is DNS subdomain: One or more lowercase rfc1035/rfc1123
+        labels separated by '.' with a maximum length of 253 characters '''
+
+        dns_subdomain = re.compile(r"""^[a-z0-9\.-]{1,253}$""")
+        return bool(dns_subdomain.match(name))
+
+    def get_path(self, kind, namespace="", name="", api=""):
+        " generate URL based on values, api is apiVersion or discovered one of the kind "
+        kind = self.kind(kind)
+        resource = self.resource(kind)
+
+        if not api and resource:
+            api = '/'.join(filter(None, [resource['group'], resource['version']]))
+        if not api:
+            api = '/api/v1'
+        elif not api.startswith('/'):
+            api = '/apis/{0}'.format(api) if '/' in api else '/api/{0}'.format(api)
+
+        if resource and not resource['namespaced'] and kind != 'namespaces':
+            # cluster wide object, its name may come as namespace, e.g. nodes
+            name, namespace = name or namespace, ""
+
+        if kind == 'namespaces':
+            if namespace:
+                return '{api}/namespaces/{namespace}'.format(api=api, namespace=namespace)
+            elif name:
+                return '{api}/namespaces/{namespace}'.format(api=api, namespace=name)
+
+        if name and namespace:
+            return '{api}/namespaces/{namespace}/{kind}/{name}'.format(api=api, namespace=namespace, kind=kind, name=name)
+        elif namespace:
+            return '{api}/namespaces/{namespace}/{kind}'.format(api=api, namespace=namespace, kind=kind)
+        elif name:
+            return '{api}/{kind}/{name}'.format(api=api, kind=kind, name=name)
+        else:
+            return '{api}/{kind}'.format(api=api, kind=kind)
+
+    def _new_session(self):
+        """ keep-alive session with the connection pool for the api server """
+        session = requests.Session()
+        adapter = _SSLContextAdapter(ssl_context=self.ssl_context, pool_connections=1,
+                                     pool_maxsize=self.pool_maxsize)
+        session.mount(self.api_server, adapter)
+
+        if 'username' in self.auth:
+            session.auth = (self.auth['username'], self.auth['password'])
+        session.headers.update(self.auth.get('header_dict', {}))
+        # gzip is the only encoding api server supports, requests decodes it
+        session.headers['Accept-Encoding'] = 'gzip' if self.compression else 'identity'
+        log.debug("opened connection pool of %s to %s", self.pool_maxsize, self.api_server)
+        return session
+
+    def get_session(self):
+        """ get pooled session, recycle it in case it was idle for too long
+        as api server or load balancer closes idle connections anyway """
+        now = time.time()
+        if self.session is not None and now - self.last_used > self.pool_idle_timeout:
+            log.debug("connection pool to %s is idle for %s seconds, recycling",
+                      self.api_server, int(now - self.last_used))
+            self.close_session()
+        if self.session is None:
+            self.session = self._new_session()
+        self.last_used = now
+        return self.session
+
+    def close_session(self):
+        """ close pooled connections of the session """
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def _iter_counted(self, ret, chunk_size=JSON_CHUNK_SIZE):
+        ''' read response body in chunks as they come on the wire, counting
+        their bytes before they are decompressed, ret.raw.tell() stays 0 on
+        chunked bodies '''
+        encoding = ret.headers.get('Content-Encoding', '').lower()
+        decoder = None
+        if encoding in ('gzip', 'deflate'):
+            # accept both gzip and zlib headers
+            decoder = zlib.decompressobj(32 + zlib.MAX_WBITS)
+        wire = decoded = 0
+        try:
+            for chunk in ret.raw.stream(chunk_size, decode_content=False):
+                wire += len(chunk)
+                if decoder is not None:
+                    chunk = decoder.decompress(chunk)
+                decoded += len(chunk)
+                if chunk:
+                    yield chunk
+            if decoder is not None:
+                chunk = decoder.flush()
+                decoded += len(chunk)
+                if chunk:
+                    yield chunk
+        except (Urllib3Error, zlib.error) as exp:
+            raise requests.exceptions.ConnectionError(exp)
+        finally:
+            self.count('bytes_wire', wire)
+            self.count('bytes_decoded', decoded)
+
+    def request(self, method, path, params=None, data=None, headers=None, stream=False):
+        """ make request through the pooled session, returns requests.Response,
+        failed requests are repeated according to retry_delay """
+        attempt = 0
+        while True:
+            time.sleep(self.throttle())
+            self.count('requests')
+            try:
+                # body is always streamed to count its bytes on the wire
+                ret = self.get_session().request(method, self.url(path), params=params,
+                                                 data=data, headers=headers,
+                                                 timeout=self.timeout, stream=True)
+                delay = self.retry_delay(method, attempt, code=ret.status_code,
+                                         retry_after=ret.headers.get('Retry-After'))
+                if delay is not None:
+                    # release the connection of the discarded response
+                    ret.close()
+                elif not stream:
+                    ret._content = b''.join(self._iter_counted(ret))  # pylint: disable=protected-access
+                    ret._content_consumed = True  # pylint: disable=protected-access
+                    ret.raw.release_conn()
+            except requests.exceptions.RequestException as exp:
+                delay = self.retry_delay(method, attempt, error=True, connect_error=_is_connect_error(exp))
+                if delay is None:
+                    log.error("Can't make request due to error: %s", exp)
+                    raise Exception(str(exp))
+            except Exception as exp:
+                log.error("Can't make request due to error: %s", exp)
+                raise Exception(str(exp))
+            if delay is None:
+                return ret
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _load_body(text):
+        """ load json body of the response, raise on kubernetes failure status """
+        try:
+            body = json.loads(text) if text else {}
+        except ValueError as exp:
+            log.info("could not load json from body due to [%s], input is [%s]", exp, text)
+            body = {}
+        if body.get('kind') == 'Status' and body.get('status') == 'Failure':
+            raise Exception(body)
+        return body
+
+    def get(self, path, data=None):
+        ''' get any object from kubernetes based on URL, threads asking for
+        the same URL at once share single request '''
+
+        cached = self.informed_get(path, data)
+        if cached is None:
+            cached = self.memo_get(path, data)
+        if cached is None:
+            cached = self.memo_listed(path, data)
+        if cached is not None:
+            self.count('cached')
+            return cached
+
+        key = self._memo_key(path, data)
+        with self.inflight_lock:
+            flight = self.inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.inflight[key] = _Flight()
+        if not leader:
+            self.count('coalesced')
+            log.trace("GET %s coalesced with the request in flight", path)
+            return flight.wait()
+        try:
+            flight.body = self.fetch(path, data)
+            self.memo_put(path, data, flight.body)
+        except Exception:
+            flight.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self.inflight_lock:
+                del self.inflight[key]
+            flight.done.set()
+        # followers copy flight.body concurrently, the caller gets its own copy
+        return copy.deepcopy(flight.body)
+
+    def fetch(self, path, data=None):
+        ''' make GET request, see get '''
+        if self.protobuf_path(path):
+            body = self.fetch_protobuf(path, data)
+            if body is not None:
+                return body
+        ret = self.request('GET', path, params=data)
+        log.trace("GET got a reply: %s", ret.text)
+
+        if ret.status_code == 404:
+            raise LookupError
+        return self._load_body(ret.text)
+
+    def protobuf_path(self, path, fields=None):
+        ''' check that the kind of the URL can be read in protobuf, kinds
+        which had fields unknown to the decoder are read in json unless the
+        list is projected '''
+        match = INFORMED_PATH.match(path) if self.protobuf else None
+        if not match or match.group('api') != 'api/v1' or match.group('kind') not in PROTOBUF_KINDS:
+            return False
+        return bool(fields) or match.group('kind') not in self.protobuf_partial
+
+    def fetch_protobuf(self, path, data=None, fields=None):
+        ''' make GET request of the object or list preferring protobuf, None
+        if the answer can't be used: the object has fields unknown to the
+        decoder, or the fields (traverse_dict paths) of the items the list
+        is projected to are or contain such fields '''
+        ret = self.request('GET', path, params=data, headers={'Accept': PROTOBUF_ACCEPT})
+        if ret.status_code == 404:
+            raise LookupError
+        if not ret.headers.get('Content-Type', '').startswith(PROTOBUF_TYPE):
+            # server answered in json
+            return self._load_body(ret.text)
+        if ret.status_code != 200:
+            # failure status is easier to read in json
+            return None
+        try:
+            body, unknown = _decode_protobuf(ret.content)
+        except (ValueError, IndexError, KeyError, UnicodeDecodeError) as exp:
+            log.debug("could not decode protobuf of %s: %s", path, exp)
+            return None
+        if not fields and unknown:
+            log.debug("protobuf of %s has fields unknown to the client in %s, reading json",
+                      path, ', '.join(sorted(unknown)))
+            self.protobuf_partial.add(INFORMED_PATH.match(path).group('kind'))
+            return None
+        for field in fields or []:
+            field = 'items:' + field
+            if any(i == field or i.startswith(field + ':') or field.startswith(i + ':') for i in unknown if i):
+                log.debug("protobuf of %s has fields unknown to the client in %s, reading json", path, field)
+                return None
+        return body
+
+    def get_metadata(self, path, data=None):
+        ''' get object or list based on URL reduced to metadata. Server sends
+        PartialObjectMetadata(List) if it supports it, otherwise the full
+        object is reduced by the client '''
+        cached = self.informed_get(path, data)
+        if cached is None:
+            cached = self.memo_get(path, data)
+        if cached is None:
+            cached = self.memo_get(path, dict(data or {}, **{'as': 'PartialObjectMetadata'}))
+        if cached is not None:
+            self.count('cached')
+            return _metadata_only(cached)
+
+        match = INFORMED_PATH.match(path)
+        if match and match.group('name'):
+            headers = {'Accept': METADATA_ACCEPT}
+        elif match:
+            headers = {'Accept': METADATA_LIST_ACCEPT}
+        else:
+            headers = None
+        ret = self.request('GET', path, params=data, headers=headers)
+        log.trace("GET got a reply: %s", ret.text)
+        if ret.status_code == 404:
+            raise LookupError
+        body = _metadata_only(self._load_body(ret.text))
+        self.memo_put(path, dict(data or {}, **{'as': 'PartialObjectMetadata'}), body)
+        return body
+
+    def iter_items(self, path, data=None, page_size=None, fields=None, meta=None):
+        ''' list collection based on URL page by page using limit and continue,
+        yields items decoded one by one out of the response stream, so neither
+        the page nor its tree is in memory at once. Items are projected to the
+        fields (traverse_dict paths) if given, meta gets list metadata. Lists
+        projected to metadata are requested as PartialObjectMetadataList '''
+        cached = self.informed_get(path, data)
+        if cached is not None:
+            self.count('cached')
+            if meta is not None:
+                meta.update(cached.get('metadata', {}))
+            for item in cached.get('items', []):
+                yield _project(item, fields) if fields else item
+            return
+        params = dict(data or {}, limit=int(page_size or self.page_size))
+        headers = None
+        if fields and all(field.startswith('metadata:') for field in fields):
+            headers = {'Accept': METADATA_LIST_ACCEPT}
+        while True:
+            members = None
+            if not headers and self.protobuf_path(path, fields):
+                members = self.fetch_protobuf(path, params, fields)
+            if members is not None:
+                for item in members.pop('items', None) or []:
+                    yield _project(item, fields) if fields else item
+            else:
+                members = {}
+                for item in self._iter_json_items(path, params, headers, members):
+                    yield _project(item, fields) if fields else item
+            if meta is not None and not meta:
+                # resourceVersion of the first page is the one of the list
+                meta.update(members.get('metadata') or {})
+            token = traverse_dict(members, 'metadata:continue', None)
+            if not token:
+                return
+            params['continue'] = token
+
+    def _iter_json_items(self, path, params, headers, members):
+        ''' stream items of the list page, members receive the rest of it '''
+        ret = self.request('GET', path, params=params, headers=headers, stream=True)
+        try:
+            if ret.status_code == 404:
+                raise LookupError
+            if ret.status_code != 200:
+                self._load_body(ret.text)
+                raise Exception("list of {0} failed with code {1}".format(path, ret.status_code))
+            for item in _iter_json_list(self._iter_counted(ret), members):
+                yield item
+        finally:
+            ret.close()
+
+    def iter_list(self, kind, namespace="", label_selector=None, field_selector=None,
+                  page_size=None, fields=None):
+        ''' iterate over objects of the kind, see iter_items '''
+        data = {}
+        if label_selector:
+            data['labelSelector'] = _prepare_selector(label_selector)
+        if field_selector:
+            data['fieldSelector'] = _prepare_selector(field_selector)
+        return self.iter_items(self.get_path(kind, namespace), data, page_size, fields)
+
+    def delete(self, path, data=None):
+        ''' delete any object from kubernetes based on URL '''
+
+        if data is not None:
+            data = json.dumps(data)
+        ret = self.request('DELETE', path, data=data)
+        log.trace("DELETE got a reply: %s", ret.text)
+        body = self._load_body(ret.text)
+        self.after_write(path, body, deleted=True)
+        if self.known_namespaces is not None and os.path.dirname(path.rstrip('/')) == self.get_path('namespaces'):
+            self.known_namespaces.discard(os.path.basename(path.rstrip('/')))
+        return body
+
+    def post(self, path, data):
+        ''' create any object in kubernetes based on URL '''
+
+        # Prepare headers
+        header = {"Content-Type": "application/json"}
+        ret = self.request('POST', path, data=json.dumps(data), headers=header)
+
+        # Check requests status
+        log.trace("POST got a reply: %s", ret.text)
+        body = self._load_body(ret.text)
+        self.after_write(path, body)
+        if self.known_namespaces is not None and path.rstrip('/') == self.get_path('namespaces'):
+            self.known_namespaces.add(traverse_dict(data, "metadata:name", ""))
+        return body
+
+    def namespace_exists(self, name):
+        ''' check namespace presence, namespaces are listed once and the list is
+        kept up to date by post and delete of this client '''
+        if self.known_namespaces is None or time.time() > self.namespaces_expire:
+            try:
+                names = self.get_names(self.get(self.get_path('namespaces')))
+            except Exception as exp:  # pylint: disable=broad-except
+                # e.g. user is not allowed to list namespaces
+                log.debug("could not list namespaces due to: %s", exp)
+                try:
+                    self.get(self.get_path('namespaces', name))
+                    return True
+                except LookupError:
+                    return False
+            self.known_namespaces = set(names)
+            self.namespaces_expire = time.time() + self.namespaces_ttl
+        return name in self.known_namespaces
+
+    def put(self, path, data):
+        ''' put any object in kubernetes based on URL '''
+
+        # Prepare headers
+        header = {"Content-Type": "application/json"}
+        ret = self.request('PUT', path, data=json.dumps(data), headers=header)
+
+        # Check requests status
+        log.trace("PUT got a reply: %s", ret.text)
+        body = self._load_body(ret.text)
+        self.after_write(path, body)
+        return body
+
+    def patch(self, path, data, patch_mode="json"):
+        ''' patch any object in kubernetes based on URL '''
+
+        log.trace("patch operations are %s", data)
+
+        # Prepare headers
+        if patch_mode == "merge":
+            # RFC7386
+            header = {"Content-Type": "application/merge-patch+json"}
+        elif patch_mode == "k8s":
+            # Kubernetes custom implementation of merge-patch
+            header = {"Content-Type": "application/strategic-merge-patch+json"}
+        else:
+            # RFC6902
+            header = {"Content-Type": "application/json-patch+json"}
+
+        ret = self.request('PATCH', path, data=json.dumps(data), headers=header)
+        log.trace("PATCH got a reply: %s", ret.text)
+        body = self._load_body(ret.text)
+        self.after_write(path, body)
+        return body
+
+    def watch(self, path, data=None, timeout=None):
+        ''' watch collection based on URL, yields (type, object) of the events
+        until server closes the stream or timeout is reached '''
+        params = dict(data or {}, watch='true')
+        read_timeout = None
+        if timeout:
+            params['timeoutSeconds'] = int(math.ceil(timeout))
+            # server closes the stream on timeoutSeconds, give it time to do so
+            read_timeout = params['timeoutSeconds'] + self.timeout
+        try:
+            ret = self.get_session().get(self.url(path), params=params, stream=True,
+                                         timeout=(self.timeout, read_timeout))
+        except Exception as exp:
+            log.error("Can't make request due to error: %s", exp)
+            raise Exception(str(exp))
+        try:
+            if ret.status_code != 200:
+                self._load_body(ret.text)
+                raise Exception("watch of {0} failed with code {1}".format(path, ret.status_code))
+            pending = b''
+            for chunk in self._iter_counted(ret, requests.models.ITER_CHUNK_SIZE):
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    log.trace("WATCH got an event: %s", event)
+                    yield event.get('type'), event.get('object', {})
+        finally:
+            ret.close()
+
+
+class AsyncKubernetes(Kubernetes):
+    """ tornado based client, get/post/put/patch/delete are coroutines which
+    resolve to the same bodies as Kubernetes ones, authentication is shared
+    with Kubernetes.get_auth. Use gather to make independent requests as one
+    concurrent wave out of the synchronous code. """
+
+    def __init__(self, kubeconfig="", context_name=""):
+        super(AsyncKubernetes, self).__init__(kubeconfig, context_name)
+        self.io_loop = tornado.ioloop.IOLoop()
+        self.http_client = AsyncHTTPClient(self.io_loop, force_instance=True,
+                                           max_clients=self.pool_maxsize)
+        # the loop can be run by one thread at a time
+        self.loop_lock = threading.Lock()
+        # synchronous client the retries are accounted to
+        self.owner = None
+
+    def close(self):
+        """ close the http client and its IOLoop """
+        super(AsyncKubernetes, self).close()
+        self.http_client.close()
+        self.io_loop.close()
+
+    def retry_delay(self, *args, **kwargs):
+        """ retries count to the budget of the owning client """
+        if self.owner is not None:
+            return self.owner.retry_delay(*args, **kwargs)
+        return super(AsyncKubernetes, self).retry_delay(*args, **kwargs)
+
+    def informed_get(self, path, data=None):
+        """ serve the get out of the informers of the owning client """
+        if self.owner is not None:
+            return self.owner.informed_get(path, data)
+        return None
+
+    def discovery(self):
+        """ resources discovered by the owning client """
+        if self.owner is not None:
+            return self.owner.discovery()
+        return {}
+
+    def after_write(self, path, body, deleted=False):
+        """ keep the caches of the owning client up to date """
+        if self.owner is not None:
+            self.owner.after_write(path, body, deleted)
+
+    @tornado.gen.coroutine
+    def request(self, method, path, params=None, data=None, headers=None):
+        """ make request on the client loop, resolves to tornado HTTPResponse """
+        header_dict = dict(self.auth.get('header_dict', {}))
+        header_dict['Accept-Encoding'] = 'gzip' if self.compression else 'identity'
+        header_dict.update(headers or {})
+        req = HTTPRequest(url_concat(self.url(path), params or {}), method=method,
+                          headers=header_dict, body=data,
+                          auth_username=self.auth.get('username'),
+                          auth_password=self.auth.get('password'),
+                          ssl_options=self.ssl_context,
+                          request_timeout=self.timeout,
+                          # decompressed by request to count bytes on the wire
+                          decompress_response=False,
+                          allow_nonstandard_methods=True)
+        attempt = 0
+        while True:
+            # no flock on the IOLoop thread
+            delay = self.throttle(shared=False)
+            if delay:
+                yield tornado.gen.sleep(delay)
+            self.count('requests')
+            ret = yield self.http_client.fetch(req, raise_error=False)
+            if ret.code == 599:
+                # connection or timeout error
+                delay = self.retry_delay(method, attempt, error=True, connect_error=_is_connect_error(ret.error))
+                if delay is None:
+                    log.error("Can't make request due to error: %s", ret.error)
+                    raise Exception(str(ret.error))
+            else:
+                delay = self.retry_delay(method, attempt, code=ret.code,
+                                         retry_after=ret.headers.get('Retry-After'))
+            if delay is None:
+                body = ret.body or b''
+                self.count('bytes_wire', len(body))
+                if ret.headers.get('Content-Encoding', '').lower() in ('gzip', 'deflate'):
+                    body = zlib.decompress(body, 32 + zlib.MAX_WBITS)
+                    ret.buffer = io.BytesIO(body)
+                    ret._body = None  # pylint: disable=protected-access
+                self.count('bytes_decoded', len(body))
+                raise tornado.gen.Return(ret)
+            yield tornado.gen.sleep(delay)
+            attempt += 1
+
+    @tornado.gen.coroutine
+    def get(self, path, data=None):
+        """ get the object or the list, coalesced with requests of the same path in flight """
+        cached = self.informed_get(path, data)
+        if cached is not None:
+            self.count('cached')
+            raise tornado.gen.Return(cached)
+
+        # the loop is single threaded, concurrent calls share the future
+        key = self._memo_key(path, data)
+        future = self.inflight.get(key)
+        if future is not None:
+            self.count('coalesced')
+            body = yield future
+            raise tornado.gen.Return(copy.deepcopy(body))
+        future = self.inflight[key] = self.fetch(path, data)
+        try:
+            body = yield future
+        finally:
+            self.inflight.pop(key, None)
+        # followers resume after the leader, keep the shared body intact
+        raise tornado.gen.Return(copy.deepcopy(body))
+
+    @tornado.gen.coroutine
+    def fetch(self, path, data=None):
+        """ GET the path, raise LookupError if it is missing """
+        ret = yield self.request('GET', path, params=data)
+        log.trace("GET got a reply: %s", ret.body)
+        if ret.code == 404:
+            raise LookupError
+        raise tornado.gen.Return(self._load_body(ret.body))
+
+    @tornado.gen.coroutine
+    def delete(self, path, data=None):
+        """ DELETE the path """
+        if data is not None:
+            data = json.dumps(data)
+        ret = yield self.request('DELETE', path, data=data)
+        log.trace("DELETE got a reply: %s", ret.body)
+        body = self._load_body(ret.body)
+        self.after_write(path, body, deleted=True)
+        raise tornado.gen.Return(body)
+
+    @tornado.gen.coroutine
+    def post(self, path, data):
+        """ POST the object to the collection path """
+        ret = yield self.request('POST', path, data=json.dumps(data),
+                                 headers={"Content-Type": "application/json"})
+        log.trace("POST got a reply: %s", ret.body)
+        body = self._load_body(ret.body)
+        self.after_write(path, body)
+        raise tornado.gen.Return(body)
+
+    @tornado.gen.coroutine
+    def put(self, path, data):
+        """ PUT the object to the path """
+        ret = yield self.request('PUT', path, data=json.dumps(data),
+                                 headers={"Content-Type": "application/json"})
+        log.trace("PUT got a reply: %s", ret.body)
+        body = self._load_body(ret.body)
+        self.after_write(path, body)
+        raise tornado.gen.Return(body)
+
+    @tornado.gen.coroutine
+    def patch(self, path, data, patch_mode="json"):
+        """ PATCH the object of the path """
+        if patch_mode == "merge":
+            header = {"Content-Type": "application/merge-patch+json"}
+        elif patch_mode == "k8s":
+            header = {"Content-Type": "application/strategic-merge-patch+json"}
+        else:
+            header = {"Content-Type": "application/json-patch+json"}
+        ret = yield self.request('PATCH', path, data=json.dumps(data), headers=header)
+        log.trace("PATCH got a reply: %s", ret.body)
+        body = self._load_body(ret.body)
+        self.after_write(path, body)
+        raise tornado.gen.Return(body)
+
+    @tornado.gen.coroutine
+    def _settle(self, future):
+        """ resolve to either result or exception of the future """
+        try:
+            result = yield future
+        except Exception as exp:  # pylint: disable=broad-except
+            result = exp
+        raise tornado.gen.Return(result)
+
+    def gather(self, calls, concurrency=None):
+        """ run calls (verb, args) concurrently, at most concurrency of them at
+        once, return their bodies or exceptions in the same order. verb is either
+        name of the client method or coroutine function getting client as the
+        first argument """
+        semaphore = tornado.locks.Semaphore(concurrency) if concurrency else None
+
+        @tornado.gen.coroutine
+        def bounded(verb, args):
+            """ run the call once a slot of the concurrency is free """
+            if semaphore:
+                yield semaphore.acquire()
+            try:
+                if callable(verb):
+                    future = verb(self, *args)
+                else:
+                    future = getattr(self, verb)(*args)
+                result = yield self._settle(future)
+            finally:
+                if semaphore:
+                    semaphore.release()
+            raise tornado.gen.Return(result)
+
+        @tornado.gen.coroutine
+        def wave():
+            """ run all the calls, results are in the order of the calls """
+            results = yield [bounded(verb, args) for verb, args in calls]
+            raise tornado.gen.Return(results)
+
+        if not calls:
+            return []
+        with self.loop_lock:
+            return self.io_loop.run_sync(wave)
+
+
+def _parse_selector(selector):
+    ''' split equality based selector into (key, value) pairs, None if it
+    uses other operators '''
+    pairs = []
+    for term in (selector or '').split(','):
+        if not term:
+            continue
+        if '!=' in term or '=' not in term:
+            return None
+        key, value = term.split('=', 1)
+        # == is the same as =
+        pairs.append((key.strip(), value.lstrip('=').strip()))
+    return pairs
+
+
+def _is_newer(obj, current):
+    ''' compare resource versions, they are opaque strings but integers in practice '''
+    try:
+        return int(traverse_dict(obj, 'metadata:resourceVersion', 0)) >= \
+            int(traverse_dict(current, 'metadata:resourceVersion', 0))
+    except (TypeError, ValueError):
+        return True
+
+
+class _Informer(object):
+    """ local copy of all objects of one kind kept up to date by LIST and
+    WATCH made by own client in the background thread. Objects are indexed by
+    namespace/name, labels and node, lookup answers get requests out of it """
+
+    def __init__(self, kubeconfig, context_name, path):
+        self.path = path
+        self.k8s = Kubernetes(kubeconfig, context_name)
+        # snapshot is per identity as well, as visible objects depend on it
+        self.snapshot = os.path.join(_cache_dir('informers'), hashlib.sha1(' '.join(
+            [self.k8s.api_server, kubeconfig, context_name, path])).hexdigest())
+        self.lock = threading.Lock()
+        # (namespace, name) -> object
+        self.objects = {}
+        # (label, value) -> set of (namespace, name)
+        self.by_label = {}
+        # node name -> set of (namespace, name)
+        self.by_node = {}
+        self.list_kind = 'List'
+        self.api_version = 'v1'
+        self.resource_version = None
+        self.synced = False
+        self.stopped = threading.Event()
+        self.pid = None
+        self.thread = None
+
+    def alive(self):
+        """ check that the thread keeps the store up to date """
+        # forked processes get the copy of the store, but not the thread
+        return self.pid == os.getpid() and self.thread.is_alive()
+
+    def start(self):
+        """ load the store and start the thread watching the kind """
+        if not self.resume():
+            self.relist()
+        self.pid = os.getpid()
+        self.thread = threading.Thread(target=self.run, name='k8s informer {0}'.format(self.path))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """ stop the thread and save the synced store """
+        self.stopped.set()
+        if self.synced:
+            self.save()
+
+    def save(self):
+        ''' save the store with its resourceVersion for the next process '''
+        with self.lock:
+            state = json.dumps({'kind': self.list_kind, 'apiVersion': self.api_version,
+                                'resourceVersion': self.resource_version,
+                                'items': self.objects.values()}, separators=(',', ':'))
+        tmp = '{0}.{1}'.format(self.snapshot, os.getpid())
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(zlib.compress(state))
+            os.rename(tmp, self.snapshot)
+        except (IOError, OSError) as exp:
+            log.warning("could not save informer snapshot of %s: %s", self.path, exp)
+
+    def resume(self):
+        ''' load snapshot of the previous process and replay events since its
+        resourceVersion, False if the snapshot is missing or too old (410) '''
+        try:
+            with open(self.snapshot, 'rb') as f:
+                state = json.loads(zlib.decompress(f.read()))
+        except (IOError, ValueError, zlib.error):
+            return False
+        with self.lock:
+            self.objects, self.by_label, self.by_node = {}, {}, {}
+            for obj in state['items']:
+                self._add(self._key(obj), obj)
+            self.list_kind = state['kind']
+            self.api_version = state['apiVersion']
+            self.resource_version = state['resourceVersion']
+        try:
+            events = self.k8s.watch(self.path, {'resourceVersion': self.resource_version},
+                                    timeout=INFORMER_RESUME_TIMEOUT)
+            for event_type, obj in events:
+                if not self.apply(event_type, obj):
+                    return False
+        except Exception as exp:  # pylint: disable=broad-except
+            log.debug("informer of %s could not resume from %s: %s", self.path, self.resource_version, exp)
+            return False
+        self.synced = True
+        log.debug("informer of %s resumed with %s objects", self.path, len(self.objects))
+        return True
+
+    @staticmethod
+    def _key(obj):
+        return (traverse_dict(obj, 'metadata:namespace', None), traverse_dict(obj, 'metadata:name', None))
+
+    def _add(self, key, obj):
+        self.objects[key] = obj
+        for label in six.iteritems(traverse_dict(obj, 'metadata:labels', {}) or {}):
+            self.by_label.setdefault(label, set()).add(key)
+        node = traverse_dict(obj, 'spec:nodeName', None)
+        if node:
+            self.by_node.setdefault(node, set()).add(key)
+
+    def _remove(self, key):
+        obj = self.objects.pop(key, None)
+        if obj is None:
+            return
+        for label in six.iteritems(traverse_dict(obj, 'metadata:labels', {}) or {}):
+            self.by_label.get(label, set()).discard(key)
+        node = traverse_dict(obj, 'spec:nodeName', None)
+        if node:
+            self.by_node.get(node, set()).discard(key)
+
+    def relist(self):
+        ''' replace the store with a new list '''
+        body = self.k8s.get(self.path)
+        with self.lock:
+            self.objects, self.by_label, self.by_node = {}, {}, {}
+            for obj in body.get('items', []):
+                self._add(self._key(obj), obj)
+            self.list_kind = body.get('kind', 'List')
+            self.api_version = body.get('apiVersion', 'v1')
+            self.resource_version = traverse_dict(body, 'metadata:resourceVersion', None)
+            self.synced = True
+        log.debug("informer of %s listed %s objects", self.path, len(self.objects))
+
+    def update(self, obj, event_type='MODIFIED'):
+        ''' apply the event to the store, stale objects are ignored '''
+        key = self._key(obj)
+        with self.lock:
+            if event_type == 'DELETED':
+                self._remove(key)
+            elif key not in self.objects or _is_newer(obj, self.objects[key]):
+                self._remove(key)
+                self._add(key, obj)
+
+    def discard(self, namespace, name):
+        ''' remove the object from the store '''
+        with self.lock:
+            self._remove((namespace, name))
+
+    def run(self):
+        ''' watch the kind until stopped, listing again once the watch is lost '''
+        try:
+            while not self.stopped.is_set():
+                try:
+                    self.watch()
+                except Exception as exp:  # pylint: disable=broad-except
+                    if self.stopped.is_set():
+                        break
+                    self.synced = False
+                    log.warning("informer of %s lost the watch: %s", self.path, exp)
+                    self.stopped.wait(self.k8s.retry_backoff)
+                    try:
+                        self.relist()
+                    except Exception as exp:  # pylint: disable=broad-except
+                        log.warning("informer of %s could not list: %s", self.path, exp)
+        finally:
+            self.k8s.close()
+
+    def watch(self):
+        ''' apply the events of one watch request to the store '''
+        events = self.k8s.watch(self.path, {'resourceVersion': self.resource_version},
+                                timeout=INFORMER_WATCH_TIMEOUT)
+        for event_type, obj in events:
+            if self.stopped.is_set():
+                return
+            if not self.apply(event_type, obj):
+                self.relist()
+                return
+
+    def apply(self, event_type, obj):
+        ''' apply watch event, False on error event '''
+        if event_type == 'ERROR':
+            # resource version is gone (410), start over
+            log.debug("informer of %s got error event: %s", self.path, obj)
+            return False
+        if event_type in ('ADDED', 'MODIFIED', 'DELETED'):
+            self.update(obj, event_type)
+        self.resource_version = traverse_dict(obj, 'metadata:resourceVersion', self.resource_version)
+        return True
+
+    def lookup(self, namespace, name, data=None):
+        ''' answer get request out of the store, None if the query is not
+        supported, LookupError in case the object is not present '''
+        params = dict(data or {})
+        labels = _parse_selector(params.pop('labelSelector', None))
+        fields = _parse_selector(params.pop('fieldSelector', None))
+        if params or labels is None or fields is None or not self.synced:
+            return None
+        with self.lock:
+            if name:
+                if labels or fields:
+                    return None
+                obj = self.objects.get((namespace, name))
+                if obj is None:
+                    raise LookupError
+                return copy.deepcopy(obj)
+
+            # the narrowest index first
+            keys = None
+            for field, value in fields:
+                if field == 'spec.nodeName':
+                    keys = self.by_node.get(value, set())
+            for label in labels:
+                keys = self.by_label.get(label, set()) & keys if keys is not None \
+                    else self.by_label.get(label, set())
+            if keys is None:
+                keys = self.objects.keys()
+
+            items = []
+            for key in sorted(keys):
+                obj = self.objects[key]
+                if namespace and key[0] != namespace:
+                    continue
+                if any(str(traverse_dict(obj, field.replace('.', ':'), '')) != value
+                       for field, value in fields):
+                    continue
+                items.append(copy.deepcopy(obj))
+            return {'kind': self.list_kind, 'apiVersion': self.api_version,
+                    'metadata': {'resourceVersion': self.resource_version}, 'items': items}
+
+
+# authenticated clients cached for the process lifetime:
+# (kubeconfig, context_name) -> (kubeconfig mtime, Kubernetes)
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _get_mtime(filename):
+    try:
+        return os.stat(filename).st_mtime
+    except OSError:
+        return None
+
+
+def _current_client(kubeconfig="", context_name=""):
+    """ get client of the innermost with block of this thread, in case it
+    serves the same (or not defined) kubeconfig and context """
+    clients = _get_ambient_clients()
+    if clients:
+        k8s = clients[-1]
+        if kubeconfig in ("", k8s.kubeconfig) and context_name in ("", k8s.get_context_name()):
+            return k8s
+    return None
+
+
+def _get_client(kubeconfig="", context_name=""):
+    """ get already authenticated client for kubeconfig and context, the one of
+    running state call is preferred, otherwise it comes out of the process wide
+    registry, client is re-created once kubeconfig is changed """
+    k8s = _current_client(kubeconfig, context_name)
+    if k8s:
+        return k8s
+
+    mtime = _get_mtime(kubeconfig)
+    key = (kubeconfig, context_name)
+    with _CLIENTS_LOCK:
+        cached = _CLIENTS.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        if cached:
+            log.debug("kubeconfig %s is changed, dropping cached client", kubeconfig)
+            cached[1].close()
+        k8s = Kubernetes(kubeconfig, context_name)
+        k8s.shared = True
+        _CLIENTS[key] = (mtime, k8s)
+    return k8s
+
+
+@atexit.register
+def _close_clients():
+    ''' close connection pools of cached clients on process exit '''
+    with _CLIENTS_LOCK:
+        for _, k8s in _CLIENTS.values():
+            k8s.close()
+        _CLIENTS.clear()
+
+
+def _get_status_code(exp):
+    ''' get HTTP code out of kubernetes failure status raised by the client '''
+    if exp.args and isinstance(exp.args[0], dict):
+        return exp.args[0].get('code')
+    return None
+
+
+def _prepare_selector(labels):
+    return ','.join(["{0}={1}".format(k, v) for k, v in labels.iteritems()])
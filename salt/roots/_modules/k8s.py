@@ -8,29 +8,93 @@ Roadmap:
 
 * Add (auto)scalling
 
+:configuration: The REST client can be tuned from the minion configuration:
+
+.. code-block:: yaml
+
+    # size of the keep-alive connection pool per api server
+    k8s.pool_maxsize: 10
+    # seconds an idle pooled connection is kept before the pool is recycled
+    k8s.pool_idle_timeout: 60
+    # seconds to wait for the api server to answer
+    k8s.timeout: 30
+    # ask the api server for gzip compressed responses
+    k8s.compression: True
+    # read pods, nodes, namespaces, replication controllers, services, events
+    # and secrets in protobuf, objects and pages with fields unknown to the
+    # client are read again in JSON
+    k8s.protobuf: False
+    # items per page of the lists consumed by k8s.drain, names_only listing etc.
+    k8s.page_size: 500
+    # number of pods k8s.drain removes at once
+    k8s.drain_concurrency: 10
+    # seconds k8s.drain waits for the pods to terminate
+    k8s.drain_timeout: 300
+    # seconds the list of namespaces is trusted before it is listed again
+    k8s.namespace_cache_ttl: 300
+    # seconds the resources discovered out of /api and /apis are kept on disk,
+    # the disk copy is used out of the private cache directory only
+    k8s.discovery_ttl: 600
+    # parsed manifests kept in memory, 0 disables it, and whether they are
+    # kept on disk for the next process as well, unchanged files are not
+    # parsed again. The disk copy is used out of the private cache directory only
+    k8s.manifest_cache_size: 256
+    k8s.manifest_cache_disk: True
+    # documents parsed ahead of the one k8s.create applies with stream=True
+    k8s.manifest_queue_size: 16
+    # objects of the same tier k8s.create applies at once, see APPLY_TIERS
+    k8s.apply_concurrency: 10
+    # attempts per request, base and maximum delay of exponential backoff for
+    # rejected (429) or failed requests, and retries allowed per state call
+    k8s.retry_max: 5
+    k8s.retry_backoff: 0.5
+    k8s.retry_max_delay: 30
+    k8s.retry_budget: 20
+    # requests per second and burst of the token bucket shared by all salt
+    # processes of the host talking to the same api server, 0 disables it.
+    # Requests of k8s.gather share the bucket of their own process only
+    k8s.qps: 0
+    k8s.burst: 100
+    # kinds kept in memory by LIST and WATCH and served without requests,
+    # the store is saved on exit and the next process resumes the WATCH
+    # from the saved resourceVersion instead of listing again, none by default
+    k8s.informers: []
+
+Long living processes, e.g. the minion running states one after another,
+benefit from informers of the kinds they read a lot:
+
+.. code-block:: yaml
+
+    k8s.informers: [pods, replicationcontrollers, services, nodes, events]
+
 '''
 
 from __future__ import absolute_import
 
 import os
-import re
 import logging
 import random
 import json
 import copy
 import base64
 import hashlib
-import tempfile
 import time
-from urllib import basejoin as urljoin
+from multiprocessing.pool import ThreadPool
 from salt.ext.six.moves.urllib.parse import urlparse as _urlparse  # pylint: disable=no-name-in-module
 import salt.ext.six as six
 import yaml
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
 
-import salt.utils.http as http
 from salt.utils import dictdiffer, traverse_dict
 from salt.utils.dictupdate import update as dictupdate
-from salt.utils.dictupdate import merge as dictmerge
+import tornado.gen
+import _k8s_client  # pylint: disable=import-error
+from _k8s_client import (  # pylint: disable=import-error
+    INFORMED_PATH, _get_opt, _parse_json, _parse_yaml, _manifest_engine, _stream_manifest, Kubernetes, _get_client,
+    _get_status_code, _prepare_selector)
 
 __virtualname__ = 'k8s'
 
@@ -43,374 +107,82 @@ FORBIDDEN_ANNOTATION = "salt/failing"
 
 def __virtual__():
     '''Load module'''
+    _k8s_client.configure(__opts__)  # pylint: disable=undefined-variable
     return __virtualname__
 
 
-class Kubernetes(object):
-
-    def __init__(self, kubeconfig="", context_name=""):
-        self.context_name = context_name
-        self.kubeconfig = kubeconfig
-        self.client_crt = tempfile.mktemp()
-        self.client_key = tempfile.mktemp()
-        self.ca = tempfile.mktemp()
-        self.known_namespaces = []
-        self.get_auth()
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exc_type, exc_value, traceback):
-        for i in [self.client_crt, self.client_key, self.ca]:
-            try:
-                os.unlink(i)
-            except OSError:
-                pass
-            except Exception as e:
-                log.info('could not cleanup tmp file %s due to error %s', i, e)
-
-    def guess_api_version(self, kind):
-        kind = self.kind(kind)
-        if kind == 'replicationcontrollers':
-            return 'v1'
-        else:
-            return 'extensions/v1beta1'
-
-    @staticmethod
-    def load_manifest(filename):
-        """ load manifest in yaml or json format into the dictionary or array of dictionaries
-        support multiple documents in single file """
-        data = []
-        if not filename:
-            return {}
-        if not os.path.isfile(filename):
-            log.error("path %s is not file", filename)
-            return {}
-        log.debug("loading manifest %s", filename)
-        with open(filename, 'r') as f:
-            try:
-                for i in yaml.safe_load_all(f):
-                    if isinstance(i, six.string_types):
-                        log.error("expected manifest data, but got plaintext: %s", i)
-                    else:
-                        data.append(i)
-            except yaml.YAMLError as exc:
-                log.error("yaml can't be loaded due to error: [%s]", exc)
-            except:
-                try:
-                    for line in f:
-                        while True:
-                            try:
-                                jobj = json.loads(line)
-                                break
-                            except ValueError:
-                                # Not yet a complete JSON value
-                                line += next(f)
-                        data.append(jobj)
-                except:
-                    log.error("manifest file %s is neither yaml nor json file or format is wrong", filename)
-        if len(data) == 1:
-            return data[0]
-        else:
-            return data
-
-    def _get_context(self):
-        """
-        Get the context info such as:
-            cluster info
-            user info
-        from kubeconfig file, if context_name is not set,
-        current-context will be used automatically.
-        """
-        config = self.load_manifest(self.kubeconfig)
-
-        if not self.context_name:
-            self.context_name = config.get('current-context')
-        log.debug('context name is: %s', self.context_name)
-
-        for i in config.get('contexts', []):
-            if i.get('name', '') == self.context_name:
-                context = i.get('context')
-                break
-        else:
-            return {}
-
-        cluster_name = context.get('cluster')
-        user_name = context.get('user')
-
-        for i in config.get('clusters', []):
-            if i.get('name', '') == cluster_name:
-                cluster = i.get('cluster', {})
-                log.trace("cluster info: %s", cluster)
-                break
-        else:
-            return {}
-
-        for i in config.get('users', []):
-            if i.get('name', '') == user_name:
-                user = i.get('user', {})
-                log.trace("user info: %s", cluster)
-                break
-        else:
-            return {}
-
-        return dictmerge(cluster, user)
-
-    def get_context_name(self):
-        return self.context_name
-
-    @staticmethod
-    def get_names(kobj):
-        """ get names out of any object received by kubernetes or array of objects"""
-        log.trace("got kubernetes object: %s", kobj)
-        names = []
-        if "items" in kobj:
-            for i in kobj.get("items", []):
-                name = traverse_dict(i, "metadata:name", None)
-                if name:
-                    names.append(name)
-        elif traverse_dict(kobj, "metadata:name", None):
-            names.append(traverse_dict(kobj, "metadata:name", None))
-        log.trace("got names: %s", names)
-        return names
-
-    @staticmethod
-    def get_labels(kobj, label_name=None):
-        '''Get all labels from a kube object.'''
-        if label_name:
-            return traverse_dict(kobj, "metadata:labels:{0}".format(label_name), None)
-        return traverse_dict(kobj, "metadata:labels", None)
-
-    def get_auth(self):
-        context = self._get_context()
-        self.auth = {}
-
-        self.api_server = context.get('server', 'http://127.0.0.1:8080')
-
-        if 'client-certificate-data' in context and 'client-key-data' in context:
-            # we have client certification auth
-            log.trace('client-certificate-data %s', context.get('client-certificate-data', ""))
-            with open(self.client_crt, 'w') as crt:
-                crt.write(base64.decodestring(context.get('client-certificate-data', "")))
-            log.trace('client-key-data %s', context.get('client-key-data', ""))
-            with open(self.client_key, 'w') as key:
-                key.write(base64.decodestring(context.get('client-key-data', "")))
-            self.auth['cert'] = (self.client_crt, self.client_key)
-
-        if self.api_server.startswith('https'):
-            log.trace('certificate-authority-data %s', context.get('certificate-authority-data', ""))
-            with open(self.ca, 'w') as ca:
-                ca.write(base64.decodestring(context.get('certificate-authority-data', "")))
-            self.auth['ca_bundle'] = self.ca
-            self.auth['verify_ssl'] = True
-
-        # token and username/password are mutually exclusive
-        if 'token' in context:
-            self.auth.setdefault('header_dict', {})['Authorization'] = 'Bearer {0}'.format(context.get('token'))
-        elif 'username' in context and 'password' in context:
-            self.auth['username'] = context.get('username')
-            self.auth['password'] = context.get('password')
-
-        log.trace('kubernetes login information: %s', self.auth)
-        return self.auth
-
-    def url(self, path):
-        log.debug("generated url: %s", urljoin(self.api_server, path))
-        return urljoin(self.api_server, path)
-
-    @staticmethod
-    def kind(kind):
-        """ generate normalized kind name out of user defined ones: """
-        # format is 0 element is "expected" by k8s the rest is aliases
-        kinds = {
-            "pods": ["pod", "po"],
-            "services": ["service", "svc", "svcs"],
-            "deployments": ["deployment"],
-            "replicasets": ["rs"],
-            "replicationcontrollers": ["rc", "rcs", "replicationcontroller"],
-            "nodes": ["no", "node", ],
-            "events": ["ev", "event", "evs"],
-            "limitranges": ["limitrange", "limit", "limits"],
-            "persistentvolumes": ["pv", "persistentvolume", "pvs"],
-            "persistentvolumeclaims": ["pvc", "persistentvolumeclaim", "pvcs"],
-            "resourcequotas": ["resourcequota", "quota", "quotas"],
-            "namespaces": ["namespace", "ns"],
-            "serviceaccounts": [],
-            "ingresses": ["ing"],
-            "horizontalpodautoscalers": ["hpa"],
-            "daemonsets": ["ds"],
-            "configmaps": ["configmap"],
-            "componentstatuses": ["cs"],
-            "endpoints": ["ep", "endpoint"],
-            "secrets": ["secret"]
-        }
-
-        log.trace("Got object for normalization: %s", kind)
-        if isinstance(kind, bool):
-            # for some reason k8s.get no produces False as input
-            kind = "nodes"
-        else:
-            kind = kind.lower()
-            for k, v in kinds.iteritems():
-                if kind == k or kind in v:
-                    kind = k
-                    break
-
-        log.trace("normalized object is: %s", kind)
-        return kind
-
-    @staticmethod
-    def is_dns_subdomain(name):
-        ''' Check that name is DNS subdomain: One or more lowercase rfc1035/rfc1123
-        labels separated by '.' with a maximum length of 253 characters '''
-
-        dns_subdomain = re.compile(r"""^[a-z0-9\.-]{1,253}$""")
-        return bool(dns_subdomain.match(name))
-
-    def get_path(self, kind, namespace="", name="", api=""):
-        " generate URL based on values "
-        kind = self.kind(kind)
-
-        if api == 'extensions/v1beta1' or api == '/apis/extensions/v1beta1':
-            api = '/apis/extensions/v1beta1'
-        else:
-            api = '/api/v1'
-
-        if kind == 'namespaces':
-            if namespace:
-                return '{api}/namespaces/{namespace}'.format(api=api, namespace=namespace)
-            elif name:
-                return '{api}/namespaces/{namespace}'.format(api=api, namespace=name)
-
-        if name and namespace:
-            return '{api}/namespaces/{namespace}/{kind}/{name}'.format(api=api, namespace=namespace, kind=kind, name=name)
-        elif kind == 'nodes' and namespace and not name:
-            return '{api}/{kind}/{name}'.format(api=api, kind=kind, name=namespace)
-        elif namespace:
-            return '{api}/namespaces/{namespace}/{kind}'.format(api=api, namespace=namespace, kind=kind)
-        elif name:
-            return '{api}/{kind}/{name}'.format(api=api, kind=kind, name=name)
-        else:
-            return '{api}/{kind}'.format(api=api, kind=kind)
-
-    def get(self, path, data=None):
-        ''' get any object from kubernetes based on URL '''
-
-        # Make request
-        try:
-            ret = http.query(self.url(path), method='GET', params=data, raise_error=False, **self.auth)
-        except Exception as exp:
-            log.error("Can't make request due to error: %s", exp)
-            raise Exception(str(exp))
-
-        log.trace("GET got a reply: %s", ret)
-
-        try:
-            body = json.loads(ret.get('body'))
-        except TypeError as exp:
-            # body is None
-            log.info("could not load json from body due to [%s], input is [%s]", exp, ret)
-            body = {}
-        if body.get('kind') == 'Status' and body.get('status') == 'Failure':
-            if body.get('code') == 404:
-                raise LookupError
-            else:
-                raise Exception(body)
-        return body
+def client_stats(kubeconfig="", context_name=""):
+    '''
+    Get request counters of the cached client: requests sent to the api
+    server, retried ones, GETs coalesced with identical GET in flight,
+    GETs answered by the informers or memo of the run and size of response
+    bodies on the wire (gzip compressed) and decoded
 
-    def delete(self, path, data=None):
-        ''' delete any object from kubernetes based on URL '''
+    CLI Example:
 
-        # Make request
-        try:
-            ret = http.query(self.url(path), method='DELETE',
-                             data=json.dumps(data), raise_error=False, **self.auth)
-        except Exception as exp:
-            log.error("Can't make request due to error: %s", exp)
-            raise exp
+    .. code-block:: bash
 
-        log.trace("DELETE got a reply: %s", ret)
+        salt '*' k8s.client_stats
+    '''
+    k8s = _get_client(kubeconfig, context_name)
+    with k8s.stats_lock:
+        return dict(k8s.stats)
 
-        body = json.loads(ret.get('body'))
-        if body.get('kind') == 'Status' and body.get('status') == 'Failure':
-            raise Exception(body)
-        return body
 
-    def post(self, path, data):
-        ''' create any object in kubernetes based on URL '''
+def load_manifest(filename):
+    '''
+    Load manifest file in yaml or json format into the dictionary or array of
+    dictionaries for multiple documents, unchanged files are not parsed again
 
-        auth = copy.copy(self.auth)
+    CLI Example:
 
-        # Prepare headers
-        header = {"Content-Type": "application/json"}
-        auth['header_dict'] = dictmerge(header, auth.get('header_dict', {}))
-        # Make request
-        try:
-            ret = http.query(self.url(path), method='POST', data=json.dumps(data), raise_error=False, **auth)
-        except Exception as exp:
-            log.error("Can't make request due to error: %s", exp)
-            raise exp
+    .. code-block:: bash
 
-        # Check requests status
-        log.trace("POST got a reply: %s", ret)
+        salt '*' k8s.load_manifest /srv/kubernetes/manifests/default/services/web.yaml
+    '''
+    return Kubernetes.load_manifest(filename)
 
-        body = json.loads(ret.get('body'))
-        if body.get('kind') == 'Status' and body.get('status') == 'Failure':
-            raise Exception(body)
-        return body
 
-    def put(self, path, data):
-        ''' put any object in kubernetes based on URL '''
-        auth = copy.copy(self.auth)
+def benchmark_manifest_parsers(filename="", size=1):
+    '''
+    Measure seconds it takes each manifest parser to parse one MB. The
+    manifest is read from the file if given, otherwise about size MB of
+    generated services is used. Parsers which can't read the manifest, e.g.
+    json for yaml file, are left out
 
-        # Prepare headers
-        header = {"Content-Type": "application/json"}
-        auth['header_dict'] = dictmerge(header, auth.get('header_dict', {}))
-        # Make request
-        try:
-            ret = http.query(self.url(path), method='PUT', data=json.dumps(data), **auth)
-        except Exception as exp:
-            log.error("Can't make request due to error: %s", exp)
-            raise exp
-
-        # Check requests status
-        log.trace("PUT got a reply: %s", ret)
-
-        body = json.loads(ret.get('body'))
-        if body.get('kind') == 'Status' and body.get('status') == 'Failure':
-            raise Exception(body)
-        return body
-
-    def patch(self, path, data, patch_mode="json"):
-        ''' patch any object in kubernetes based on URL '''
-
-        auth = copy.copy(self.auth)
-        log.trace("patch operations are %s", data)
-
-        # Prepare headers
-        # Prepare headers
-        if patch_mode == "merge":
-            # RFC7386
-            header = {"Content-Type": "application/merge-patch+json"}
-        elif patch_mode == "k8s":
-            # Kubernetes custom implementation of merge-patch
-            header = {"Content-Type": "application/strategic-merge-patch+json"}
-        else:
-            # RFC6902
-            header = {"Content-Type": "application/json-patch+json"}
+    CLI Example:
 
-        auth['header_dict'] = dictmerge(header, auth.get('header_dict', {}))
-        # Make request
-        try:
-            ret = http.query(self.url(path), method='PATCH', data=json.dumps(data), **auth)
-        except Exception as exp:
-            log.error("Can't make request due to error: %s", exp)
-            raise exp
+    .. code-block:: bash
 
-        body = json.loads(ret.get('body'))
-        if body.get('kind') == 'Status' and body.get('status') == 'Failure':
-            raise Exception(body)
-        return body
+        salt '*' k8s.benchmark_manifest_parsers
+        salt '*' k8s.benchmark_manifest_parsers /srv/kubernetes/manifests/default/services/web.yaml
+    '''
+    if filename:
+        with open(filename, 'rb') as f:
+            documents = [f.read()]
+    else:
+        service = {"kind": "Service", "apiVersion": "v1",
+                   "metadata": {"name": "svc", "namespace": "default", "labels": {"app": "svc"}},
+                   "spec": {"ports": [{"name": "http", "port": 80, "targetPort": 8080}],
+                            "selector": {"app": "svc"}}}
+        one = yaml.safe_dump(service)
+        count = max(int(float(size) * 1024 * 1024 / len(one)), 1)
+        documents = ['---\n'.join([one] * count), '\n'.join([json.dumps(service)] * count)]
+    engines = [('json', _parse_json), ('yaml', lambda content: list(yaml.load_all(content, Loader=yaml.SafeLoader)))]
+    if YamlLoader is not yaml.SafeLoader:
+        engines.append(('libyaml', _parse_yaml))
+    ret = {}
+    for name, engine in engines:
+        for content in documents:
+            started = time.time()
+            try:
+                engine(content)
+            except (ValueError, yaml.YAMLError):
+                continue
+            seconds = time.time() - started
+            megabytes = len(content) / 1024.0 / 1024.0
+            ret.setdefault(name, {})[_manifest_engine(content)] = round(seconds / megabytes, 4)
+    return ret
 
 
 def _get_filename(source, saltenv):
@@ -457,11 +229,11 @@ def label_folder_absent(kind, namespace="", name="", var="", kubeconfig="", cont
     ret = {'name': folder, 'result': True, 'comment': '', 'changes': {}}
 
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return label_folder_absent(kind=kind, namespace=namespace,
-                                       name=name, var=var,
-                                       kubeconfig=kubeconfig,
-                                       context_name=context_name, k8s=k8s)
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(label_folder_absent(kind=kind, namespace=namespace,
+                                                  name=name, var=var,
+                                                  kubeconfig=kubeconfig,
+                                                  context_name=context_name, k8s=k8s))
     old_labels = get(kind, namespace, name, k8s=k8s, labels_only=True)
     if not isinstance(old_labels, dict):
         ret["result"] = False
@@ -521,15 +293,30 @@ def get(kind, namespace="", name="", kubeconfig="", context_name="", k8s=None,
         data = None
 
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
+        with _get_client(kubeconfig, context_name) as k8s:
             return get(kind=kind, namespace=namespace, name=name,
                        kubeconfig=kubeconfig, context_name=context_name, k8s=k8s,
-                       names_only=names_only, label_selector=label_selector,
-                       field_selector=field_selector)
+                       names_only=names_only, labels_only=labels_only,
+                       label_selector=label_selector, field_selector=field_selector)
+
+    url = k8s.get_path(kind, namespace, name)
+    match = INFORMED_PATH.match(url)
+    single = bool(match and match.group('name'))
+    if names_only and not single:
+        # names of the list are collected page by page
+        try:
+            return [k8s.get_names(item)[0] for item in
+                    k8s.iter_list(kind, namespace, label_selector, field_selector,
+                                  fields=["metadata:name"])]
+        except Exception as exp:  # pylint: disable=broad-except
+            log.error("get was not successful due to: %s", exp)
+            return []
     else:
-        url = k8s.get_path(kind, namespace, name)
         try:
-            ret = k8s.get(url, data)
+            if single and (names_only or labels_only):
+                ret = k8s.get_metadata(url, data)
+            else:
+                ret = k8s.get(url, data)
         except LookupError:
             ret = {}
         except Exception as exp:
@@ -587,18 +374,19 @@ def delete(kind="", namespace="", name="", kubeconfig="", context_name="",
     # do need destructor to be called after the Kubernetes class exists so we
     # use recursion here :(
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return delete(kind=kind, namespace=namespace, name=name, cascade=cascade, grace_period=grace_period, k8s=k8s)
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(delete(kind=kind, namespace=namespace, name=name, cascade=cascade, grace_period=grace_period, k8s=k8s))
     else:
         kind = k8s.kind(kind)
         url = k8s.get_path(kind, namespace, name)
         if kind == 'replicationcontrollers' and cascade:
-            annotate("rc", namespace, name, "salt/next-action", int(time.time() + 60))
+            annotate("rc", namespace, name, "salt/next-action", int(time.time() + 60), k8s=k8s)
             scale(kind, namespace, name, 0, k8s=k8s)
             rc = get('rc', namespace, name, k8s=k8s)
             selector = traverse_dict(rc, "spec:selector", {"fakeselector": "+1"})
-            while get("pods", namespace, names_only=True, label_selector=selector, k8s=k8s):
-                time.sleep(3)
+            with k8s.uncached():
+                while get("pods", namespace, names_only=True, label_selector=selector, k8s=k8s):
+                    time.sleep(3)
 
         request_body = {
             "kind": "DeleteOptions",
@@ -650,18 +438,24 @@ def create_namespace(name, kubeconfig="", context_name="", k8s=None):
     log.trace("namespace creation requests: %s", data)  # pylint: disable=no-member
     # Make request
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return create_namespace(name=name, k8s=k8s)
-    try:
-        k8s.get(k8s.get_path('namespaces', name))
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(create_namespace(name=name, k8s=k8s))
+    if k8s.namespace_exists(name):
         log.debug("Namespace %s is already present", name)
         ret['comment'] = "Namespace {0} is already present".format(name)
-    except LookupError:
-        try:
-            k8s.post(k8s.get_path('namespaces'), data)
-            log.info("Successfully created namespace %s", name)
-            ret['changes'][name] = "namespace created"
-        except Exception as exp:
+        return ret
+    try:
+        k8s.post(k8s.get_path('namespaces'), data)
+        log.info("Successfully created namespace %s", name)
+        ret['changes'][name] = "namespace created"
+    except Exception as exp:
+        if _get_status_code(exp) == 409:
+            # created by somebody else since namespaces were listed
+            log.debug("Namespace %s is already present", name)
+            ret['comment'] = "Namespace {0} is already present".format(name)
+            if k8s.known_namespaces is not None:
+                k8s.known_namespaces.add(name)
+        else:
             log.error("Could not create namespace due to error [%s]", exp)
             ret['result'] = False
             ret['comment'] = "Could not create namespace due to error [{0}]".format(exp)
@@ -747,7 +541,7 @@ def decode_secrets(namespace, name="", kubeconfig="", context_name="", k8s=None)
     '''
 
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
+        with _get_client(kubeconfig, context_name) as k8s:
             return decode_secrets(namespace=namespace, name=name,
                                   kubeconfig=kubeconfig,
                                   context_name=context_name, k8s=k8s)
@@ -879,11 +673,11 @@ def create_secret(namespace, name, sources, kubeconfig="", context_name="", forc
         return ret
 
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return create_secret(namespace=namespace, name=name,
-                                 sources=sources, kubeconfig=kubeconfig,
-                                 context_name=context_name, force=force, update=update,
-                                 do_not_create=do_not_create, saltenv=saltenv, k8s=k8s)
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(create_secret(namespace=namespace, name=name,
+                                            sources=sources, kubeconfig=kubeconfig,
+                                            context_name=context_name, force=force, update=update,
+                                            do_not_create=do_not_create, saltenv=saltenv, k8s=k8s))
     if force:
         create_namespace(name=namespace, k8s=k8s)
 
@@ -1006,11 +800,11 @@ def create_limit_range(namespace, limits, name="limits", kubeconfig="",
     ret = {'name': name, 'result': True, 'comment': '', 'changes': {}}
 
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return create_limit_range(namespace, limits, name=name,
-                                      kubeconfig=kubeconfig,
-                                      context_name=context_name, force=force,
-                                      update=update, k8s=k8s)
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(create_limit_range(namespace, limits, name=name,
+                                                 kubeconfig=kubeconfig,
+                                                 context_name=context_name, force=force,
+                                                 update=update, k8s=k8s))
 
     normalized_limits = _normalize_limits(limits)
     if not normalized_limits:
@@ -1098,11 +892,11 @@ def create_resource_quota(namespace, quota, name="quota", update=True,
     ret = {'name': name, 'result': True, 'comment': '', 'changes': {}}
 
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return create_resource_quota(namespace, quota, name=name,
-                                         update=update, force=force,
-                                         kubeconfig=kubeconfig,
-                                         context_name=context_name, k8s=k8s)
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(create_resource_quota(namespace, quota, name=name,
+                                                    update=update, force=force,
+                                                    kubeconfig=kubeconfig,
+                                                    context_name=context_name, k8s=k8s))
 
     # we need namespace to create quotas
     if force:
@@ -1190,12 +984,12 @@ def label(kind, namespace="", name="", var="", val=None, kubeconfig="", context_
     ret = {'name': name, 'result': True, 'comment': '', 'changes': {}}
 
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return label(kind, namespace=namespace, name=name, var=var, val=val, k8s=k8s)
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(label(kind, namespace=namespace, name=name, var=var, val=val, k8s=k8s))
 
     url = k8s.get_path(kind, namespace, name)
     try:
-        kind_item = k8s.get(url)
+        kind_item = k8s.get_metadata(url)
     except LookupError:
         ret['result'] = False
         ret['comment'] = 'Could not find {0} {1} at namespace {2}'.format(kind, name, namespace)
@@ -1281,12 +1075,12 @@ def annotate(kind, namespace, name, var, val=None, kubeconfig="", context_name="
     ret = {'name': name, 'result': True, 'comment': '', 'changes': {}}
 
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return annotate(kind=kind, namespace=namespace, name=name, var=var, val=val,
-                            kubeconfig=kubeconfig, context_name=context_name, k8s=k8s)
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(annotate(kind=kind, namespace=namespace, name=name, var=var, val=val,
+                                       kubeconfig=kubeconfig, context_name=context_name, k8s=k8s))
 
     try:
-        k8s_item = get(kind, namespace, name, k8s=k8s)
+        k8s_item = k8s.get_metadata(k8s.get_path(kind, namespace, name))
         annotation = _get_annotation(k8s_item, var)
         if val:
             val = str(val)
@@ -1365,13 +1159,13 @@ def get_annotation(kind, namespace, name, annotation, kubeconfig="",
     ret = {'name': name, 'result': True, 'comment': '', 'changes': {}}
 
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
+        with _get_client(kubeconfig, context_name) as k8s:
             return get_annotation(kind=kind, namespace=namespace, name=name,
                                   annotation=annotation, kubeconfig=kubeconfig,
                                   context_name=context_name, k8s=k8s)
 
     try:
-        k8s_item = k8s.get(k8s.get_path(kind, namespace, name))
+        k8s_item = k8s.get_metadata(k8s.get_path(kind, namespace, name))
         return _get_annotation(k8s_item, annotation, {})
     except LookupError:
         ret["result"] = False
@@ -1430,12 +1224,12 @@ def create_service(namespace, source, name="", labels=None, force=True,
     ret = {'name': name, 'result': True, 'comment': '', 'changes': {}}
 
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return create_service(namespace=namespace, source=source, name=name,
-                                  labels=labels, force=force, update=update,
-                                  saltenv=saltenv, replace_name=replace_name,
-                                  replace_namespace=replace_namespace,
-                                  kubeconfig=kubeconfig, context_name=context_name, k8s=k8s)
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(create_service(namespace=namespace, source=source, name=name,
+                                             labels=labels, force=force, update=update,
+                                             saltenv=saltenv, replace_name=replace_name,
+                                             replace_namespace=replace_namespace,
+                                             kubeconfig=kubeconfig, context_name=context_name, k8s=k8s))
 
     if force:
         create_namespace(name=namespace, k8s=k8s)
@@ -1485,7 +1279,7 @@ def create_service(namespace, source, name="", labels=None, force=True,
             service_hash = _get_annotation(service, HASH_ANNOTATION)
 
             if not service_hash:
-                annotate("services", namespace, name, HASH_ANNOTATION, data_hash)
+                annotate("services", namespace, name, HASH_ANNOTATION, data_hash, k8s=k8s)
                 ret["chages"] = "prepared for salt management"
             elif data_hash != service_hash:
                 changes = _get_service_changes(service, data)
@@ -1493,7 +1287,7 @@ def create_service(namespace, source, name="", labels=None, force=True,
                     k8s.patch(k8s.get_path("services", namespace, name), changes)
                     ret['changes'] = changes
                     ret['comment'] = "Service is updated"
-                    annotate("svc", namespace, name, HASH_ANNOTATION, data_hash)
+                    annotate("svc", namespace, name, HASH_ANNOTATION, data_hash, k8s=k8s)
                 except Exception as exp:
                     ret['comment'] = "Could not update service due to {0}".format(str(exp))
                     ret['result'] = False
@@ -1556,9 +1350,9 @@ def scale(kind, namespace, name, replicas, kubeconfig="", context_name="", k8s=N
     ret = {'name': name, 'result': True, 'comment': '', 'changes': {}}
 
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return scale(kind=kind, namespace=namespace, name=name, replicas=replicas,
-                         kubeconfig=kubeconfig, context_name=context_name, k8s=k8s)
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(scale(kind=kind, namespace=namespace, name=name, replicas=replicas,
+                                    kubeconfig=kubeconfig, context_name=context_name, k8s=k8s))
     data = {
         "spec": {"replicas": replicas}
     }
@@ -1726,10 +1520,6 @@ def _get_original_rc_data(next_rc):
     return next_rc
 
 
-def _prepare_selector(labels):
-    return ','.join(["{0}={1}".format(k, v) for k, v in labels.iteritems()])
-
-
 def rolling_update(namespace, name, source, kubeconfig="", context_name="",
                    one_change_only=True, saltenv="base", create_new=True,
                    update_period=0, poll_interval=3, batch=1, k8s=None):
@@ -1737,15 +1527,15 @@ def rolling_update(namespace, name, source, kubeconfig="", context_name="",
     ret = {'name': name, 'result': True, 'comment': '', 'changes': {}}
 
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return rolling_update(namespace=namespace, name=name, source=source,
-                                  kubeconfig=kubeconfig,
-                                  context_name=context_name,
-                                  one_change_only=one_change_only,
-                                  saltenv=saltenv, create_new=create_new,
-                                  update_period=update_period,
-                                  poll_interval=poll_interval, batch=batch,
-                                  k8s=k8s)
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(rolling_update(namespace=namespace, name=name, source=source,
+                                             kubeconfig=kubeconfig,
+                                             context_name=context_name,
+                                             one_change_only=one_change_only,
+                                             saltenv=saltenv, create_new=create_new,
+                                             update_period=update_period,
+                                             poll_interval=poll_interval, batch=batch,
+                                             k8s=k8s))
 
     if isinstance(source, six.string_types):
         manifest = _get_filename(source, saltenv)
@@ -1842,10 +1632,16 @@ def rolling_update(namespace, name, source, kubeconfig="", context_name="",
     if not old_selector_hash:
         # we must mark old pods with the new labels to fit selector of old rc
         log.info("Assigning deployment selector %s to pods from rc %s", old_hash, k8s.get_names(old_rc)[0])
+        relabel = []
         for pod in get("pods", namespace, label_selector=old_selector, k8s=k8s).get('items', []):
-            log.debug("assigning label %s to kubernetes.io/deployment for pod %s", old_hash, k8s.get_names(pod)[0])
             # selector of old rc match (we own this pod)
-            label("pods", namespace, k8s.get_names(pod)[0], "kubernetes.io/deployment", old_hash)
+            if k8s.get_labels(pod, "kubernetes.io/deployment") != old_hash:
+                log.debug("assigning label %s to kubernetes.io/deployment for pod %s", old_hash, k8s.get_names(pod)[0])
+                data = {"metadata": {"labels": {"kubernetes.io/deployment": old_hash}}}
+                relabel.append(('patch', (k8s.get_path("pods", namespace, k8s.get_names(pod)[0]), data, "k8s")))
+        for res in k8s.gather(relabel):
+            if isinstance(res, Exception):
+                log.error("could not label pod due to: %s", res)
 
         # we must add some deployment key as a selector, which is different from
         # next's selector
@@ -1896,15 +1692,15 @@ def create_rc(namespace, source, name="", labels={}, kubeconfig="",
     ret = {'name': name, 'result': True, 'comment': '', 'changes': {}}
 
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return create_rc(namespace=namespace, source=source, name=name,
-                             labels=labels, kubeconfig=kubeconfig,
-                             context_name=context_name, force=force,
-                             update=update, saltenv=saltenv,
-                             replace_name=replace_name,
-                             replace_namespace=replace_namespace,
-                             patch_labels=patch_labels,
-                             one_change_only=one_change_only, k8s=k8s)
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(create_rc(namespace=namespace, source=source, name=name,
+                                        labels=labels, kubeconfig=kubeconfig,
+                                        context_name=context_name, force=force,
+                                        update=update, saltenv=saltenv,
+                                        replace_name=replace_name,
+                                        replace_namespace=replace_namespace,
+                                        patch_labels=patch_labels,
+                                        one_change_only=one_change_only, k8s=k8s))
 
     if force:
         create_namespace(namespace, k8s=k8s)
@@ -1972,24 +1768,34 @@ def create_rc(namespace, source, name="", labels={}, kubeconfig="",
 def _needs_rollback(namespace, next_rc, k8s):
     answer = False
     selector = traverse_dict(next_rc, "spec:selector", {})
-    pods = {}
+    pod_names = []
+    calls = []
     if selector:
         try:
-            pods = get("pods", namespace, label_selector=selector, k8s=k8s)
+            # only names and event queries of the pods are kept
+            for pod in k8s.iter_list("pods", namespace, label_selector=selector,
+                                     fields=["metadata:name", "metadata:uid"]):
+                pod_name = k8s.get_names(pod)[0]
+                pod_uid = traverse_dict(pod, "metadata:uid", "-12")
+                field_selector = {
+                    "involvedObject.name": pod_name,
+                    "involvedObject.namespace": namespace,
+                    "involvedObject.uid": pod_uid
+                }
+                pod_names.append(pod_name)
+                calls.append(('get', (k8s.get_path("events", namespace),
+                                      {'fieldSelector': _prepare_selector(field_selector)})))
         except LookupError:
             pass
         except Exception as exp:
             log.error("%s", exp)
-    for pod in pods.get("items", []):
-        pod_name = k8s.get_names(pod)[0]
-        pod_uid = traverse_dict(pod, "metadata:uid", "-12")
-        field_selector = {
-            "involvedObject.name": pod_name,
-            "involvedObject.namespace": namespace,
-            "involvedObject.uid": pod_uid
-        }
-        events = get("events", namespace, field_selector=field_selector, k8s=k8s)
-        for event in events.get("items"):
+
+    # events of all pods are fetched as one wave
+    for pod_name, events in zip(pod_names, k8s.gather(calls)):
+        if isinstance(events, Exception):
+            log.error("could not get events of pod %s due to: %s", pod_name, events)
+            continue
+        for event in events.get("items", []):
             log.debug("cheking even for pod %s: %s", pod_name, events)
             if event.get("reason", "").lower() in ["failedsync", "backoff", "unhealthy"]:
                 log.info("have to rollback due to pod %s with reason %s", pod_name, event.get("reason"))
@@ -2048,23 +1854,55 @@ def calculate_safe_timeout(resource):
     return max(timeouts) + secure_margin
 
 
+# kinds k8s.create applies before the rest, a tier starts after the previous
+# one succeeded, kinds missing here form the last tier
+APPLY_TIERS = [
+    ("namespaces",),
+    ("resourcequotas", "limitranges"),
+    ("secrets", "configmaps"),
+    ("services",),
+]
+
+
 def create(source, namespace="", kubeconfig="", context_name="", force=True,
-           replace_namespace=True, update=True, saltenv='base', k8s=None):
+           replace_namespace=True, update=True, saltenv='base', stream=False, prefetch=False, k8s=None):
+    '''
+    Create objects of the manifest file or dictionary. Objects are applied in
+    tiers (APPLY_TIERS), objects of the same tier at once by up to
+    k8s.apply_concurrency workers, and changes are reported per object.
+    With prefetch=True collections holding several objects of the manifest
+    are listed once up front instead of reading the objects one by one, an
+    object missing from the list, but created meanwhile, e.g. by a
+    controller, is read again and updated once its creation conflicts. With
+    stream=True the documents of the file are applied in their order while
+    the following ones are parsed, so big bundles are neither parsed nor
+    kept in memory at once
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' k8s.create salt://kubernetes/manifests/bundle.yaml stream=True
+    '''
 
     ret = {'name': "create", 'result': True, 'comment': '', 'changes': {}}
 
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return create(source=source, namespace=namespace, kubeconfig=kubeconfig, context_name=context_name,
-                          force=force, replace_namespace=replace_namespace, update=update, saltenv=saltenv, k8s=k8s)
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(create(source=source, namespace=namespace, kubeconfig=kubeconfig, context_name=context_name,
+                                     force=force, replace_namespace=replace_namespace, update=update, saltenv=saltenv,
+                                     stream=stream, prefetch=prefetch, k8s=k8s))
 
     log.debug("source is [%s], namespace is [%s] "
               "kubeconfig is [%s]", source, namespace, kubeconfig)
     if isinstance(source, six.string_types):
         log.info("manifest file is: %s", source)
         manifest = _get_filename(source, saltenv)
-        mdata = k8s.load_manifest(manifest)
-        log.debug("data is %s", mdata)
+        if stream:
+            mdata = _stream_manifest(manifest)
+        else:
+            mdata = k8s.load_manifest(manifest)
+            log.debug("data is %s", mdata)
     elif isinstance(source, dict):
         mdata = source
 
@@ -2072,86 +1910,345 @@ def create(source, namespace="", kubeconfig="", context_name="", force=True,
     if isinstance(mdata, dict):
         mdata = [mdata]
 
-    origin_namespace = namespace
+    def apply_document(data):
+        ''' create the object of the document, failures are returned as result '''
+        try:
+            return _create_object(k8s, data, namespace, force=force, update=update,
+                                  replace_namespace=replace_namespace)
+        except Exception as exp:  # pylint: disable=broad-except
+            key = _object_key(k8s, data, namespace, replace_namespace)
+            log.error("could not create %s due to: %s", key, exp)
+            return key, {'result': False, 'comment': str(exp), 'changes': {}}
+
+    if stream:
+        try:
+            for data in mdata:
+                _merge_result(ret, *apply_document(data))
+        except ValueError as exp:
+            ret['result'] = False
+            ret['comment'] = '\n'.join(filter(None, [ret['comment'], str(exp)]))
+        return ret
 
+    if prefetch:
+        _prefetch_objects(k8s, mdata, namespace, replace_namespace)
+    tiers = [[] for _ in range(len(APPLY_TIERS) + 1)]
     for data in mdata:
-        log.trace("created data: %s", data)
-        if not data:
-            ret["result"] = False
-            continue
-        kind = data.get("kind", "").lower()
-        api = data.get("apiVersion", "").lower()
-        name = traverse_dict(data, "metadata:name", "")
+        kind = k8s.kind(data.get("kind", "")) if data else ""
+        tiers[next((i for i, kinds in enumerate(APPLY_TIERS) if kind in kinds), len(APPLY_TIERS))].append(data)
+    concurrency = max(int(_get_opt('k8s.apply_concurrency', 10)), 1)
+    for tier, documents in enumerate(tiers):
+        if not ret['result']:
+            skipped = sum(len(i) for i in tiers[tier:])
+            if skipped:
+                ret['comment'] = '\n'.join(filter(None, [
+                    ret['comment'], "{0} objects were not applied after failure".format(skipped)]))
+            break
+        if force and concurrency > 1 and len(documents) > 1:
+            # workers would create the same namespace at once
+            for name in set(_object_namespace(k8s, data, namespace, replace_namespace) for data in documents if data):
+                if name:
+                    create_namespace(name, k8s=k8s)
+        if concurrency == 1 or len(documents) < 2:
+            results = [apply_document(document) for document in documents]
+        else:
+            pool = ThreadPool(min(concurrency, len(documents)))
+            try:
+                run = k8s.run
+
+                def apply_joined(data, run=run):
+                    ''' apply the document within the run of the calling thread '''
+                    with k8s.joined(run):
+                        return apply_document(data)
+                results = pool.map(apply_joined, documents)
+            finally:
+                pool.close()
+                pool.join()
+        for result in results:
+            _merge_result(ret, *result)
+    return ret
 
-        log.debug("kind: [%s], api: [%s], name: [%s]", kind, api, name)
 
-        # in case of multiple manifests, we need to start over
-        if origin_namespace != namespace:
-            namespace = origin_namespace
+def _object_key(k8s, data, namespace, replace_namespace):
+    """ name of the manifest object in the results of create, objects of the
+    same name in different namespaces have different keys """
+    if not data:
+        return "empty document"
+    name = traverse_dict(data, "metadata:name", "")
+    namespace = _object_namespace(k8s, data, namespace, replace_namespace)
+    if namespace:
+        name = "{0}/{1}".format(namespace, name)
+    return "{0} {1}".format(k8s.kind(data.get("kind", "")), name)
+
+
+def _object_namespace(k8s, data, namespace, replace_namespace):
+    """ namespace create puts the manifest object in, empty for cluster wide ones """
+    resource = k8s.resource(data.get("kind", ""))
+    if resource and not resource['namespaced']:
+        return ""
+    if namespace and replace_namespace:
+        return namespace
+    return traverse_dict(data, "metadata:namespace", None) or "default"
 
-        if namespace and replace_namespace:
-            data = dictupdate(data, {"metadata": {"namespace": namespace}})
-        elif traverse_dict(data, "metadata:namespace", None):
-            namespace = traverse_dict(data, "metadata:namespace", "")
-        else:
-            namespace = "default"
 
-        log.debug("after manipulations namespace is set to %s", namespace)
+def _object_collection(k8s, data, namespace, replace_namespace):
+    """ path of the collection create puts the manifest object in """
+    kind = k8s.kind(data.get("kind", ""))
+    # the kinds with own create function do not use apiVersion of the manifest
+    api = "" if kind in ("replicationcontrollers", "services", "resourcequotas", "limitranges") \
+        else data.get("apiVersion", "").lower()
+    return k8s.get_path(kind, _object_namespace(k8s, data, namespace, replace_namespace), api=api)
 
-        kind = k8s.kind(kind)
-        if kind == "replicationcontrollers":
-            log.debug("got replication controller")
-            ret = create_rc(namespace, data, update=update, force=force, replace_namespace=replace_namespace, k8s=k8s)
-        elif kind == "services":
-            log.debug("got service")
-            ret = create_service(namespace, data, update=update, force=force, replace_namespace=replace_namespace, k8s=k8s)
-        elif kind == "resourcequotas":
-            log.debug("got resource quota")
-            ret = create_resource_quota(namespace, data, update=update, force=force, k8s=k8s)
-        elif kind == "limitranges":
-            log.debug("got limits range")
-            ret = create_limit_range(namespace, data, force=force, update=update, k8s=k8s)
-        else:
-            log.debug("using default create method for %s", kind)
+
+def _prefetch_objects(k8s, documents, namespace, replace_namespace):
+    """ list the collections create would read two or more objects of """
+    counts = {}
+    for data in documents:
+        if not data or not traverse_dict(data, "metadata:name", ""):
+            continue
+        path = _object_collection(k8s, data, namespace, replace_namespace)
+        counts[path] = counts.get(path, 0) + 1
+    k8s.prefetch([collection for collection, count in counts.items() if count > 1])
+
+
+def _merge_result(ret, key, result):
+    """ add result of the object to the results of create """
+    if result.get('changes'):
+        ret['changes'][key] = result['changes']
+    if not result.get('result', True):
+        ret['result'] = False
+    if result.get('comment'):
+        ret['comment'] = '\n'.join(filter(None, [ret['comment'], "{0}: {1}".format(key, result['comment'])]))
+
+
+def _create_object(k8s, data, namespace, force=True, update=True, replace_namespace=True):
+    """ create or update the manifest object, returns its key and result. The
+    object the prefetched list does not have is read again once it can't be
+    created, it could be created by a controller after the list was taken """
+    path = None
+    if data:
+        path = "{0}/{1}".format(_object_collection(k8s, data, namespace, replace_namespace),
+                                traverse_dict(data, "metadata:name", ""))
+    # writes of the other objects drop the list, see Kubernetes.forget
+    hinted = path is not None and k8s.listed_absent(path)
+    key, ret = _create_object_once(k8s, data, namespace, force=force, update=update,
+                                   replace_namespace=replace_namespace)
+    if ret['result'] or not hinted:
+        return key, ret
+    with k8s.uncached():
+        try:
+            k8s.get(path)
+        except Exception:  # pylint: disable=broad-except
+            # really missing, the failure is not a conflict
+            return key, ret
+        log.info("%s was created after the list of its collection, updating it", key)
+        return _create_object_once(k8s, data, namespace, force=force, update=update,
+                                   replace_namespace=replace_namespace)
+
+
+def _create_object_once(k8s, data, namespace, force=True, update=True, replace_namespace=True):
+    """ create or update the manifest object as it is known to the run """
+    ret = {'result': True, 'comment': '', 'changes': {}}
+    key = _object_key(k8s, data, namespace, replace_namespace)
+    log.trace("created data: %s", data)
+    if not data:
+        ret["result"] = False
+        ret["comment"] = "manifest document is empty"
+        return key, ret
+    kind = data.get("kind", "").lower()
+    api = data.get("apiVersion", "").lower()
+    name = traverse_dict(data, "metadata:name", "")
+
+    log.debug("kind: [%s], api: [%s], name: [%s]", kind, api, name)
+
+    namespace = _object_namespace(k8s, data, namespace, replace_namespace)
+    if namespace and replace_namespace:
+        data = dictupdate(data, {"metadata": {"namespace": namespace}})
+
+    log.debug("after manipulations namespace is set to %s", namespace)
+
+    kind = k8s.kind(kind)
+    if kind == "replicationcontrollers":
+        log.debug("got replication controller")
+        ret = create_rc(namespace, data, update=update, force=force, replace_namespace=replace_namespace,
+                        k8s=k8s)
+    elif kind == "services":
+        log.debug("got service")
+        ret = create_service(namespace, data, update=update, force=force, replace_namespace=replace_namespace,
+                             k8s=k8s)
+    elif kind == "resourcequotas":
+        log.debug("got resource quota")
+        ret = create_resource_quota(namespace, data, update=update, force=force, k8s=k8s)
+    elif kind == "limitranges":
+        log.debug("got limits range")
+        ret = create_limit_range(namespace, data, force=force, update=update, k8s=k8s)
+    else:
+        log.debug("using default create method for %s", kind)
+        try:
+            k8s.get(k8s.get_path(kind, namespace, name, api=api))
+            log.info("%s %s is already existing on %s", kind, name, namespace)
+        except LookupError:
+            if force and namespace:
+                create_namespace(namespace, k8s=k8s)
+            url = k8s.get_path(kind, namespace, api=api)
             try:
-                kobj = k8s.get(k8s.get_path(kind, namespace, name, api=api))
-                log.info("%s %s is already existing on %s", kind, name, namespace)
-                continue
-            except LookupError:
-                if force:
-                    create_namespace(namespace, k8s=k8s)
-                url = k8s.get_path(kind, namespace, api=api)
-                try:
-                    log.debug("creating resource %s with name %s", kind, name)
-                    data = _set_data_hash(data)
-                    k8s.post(url, data)
-                    log.info("created resource %s with name %s", kind, name)
-                    ret['changes']["{0} {1}".format(kind, name)] = "created"
-                except Exception as exp:
-                    log.error("could not create %s %s due to: %s", kind, name, exp)
-                    ret['comment'] = str(exp)
-                    ret['result'] = False
-                    log.error(str(exp))
-            except Exception as exp:
+                log.debug("creating resource %s with name %s", kind, name)
+                data = _set_data_hash(data)
+                k8s.post(url, data)
+                log.info("created resource %s with name %s", kind, name)
+                ret['changes'] = "created"
+            except Exception as exp:  # pylint: disable=broad-except
                 log.error("could not create %s %s due to: %s", kind, name, exp)
                 ret['comment'] = str(exp)
                 ret['result'] = False
-                log.error(str(exp))
-    return ret
+        except Exception as exp:  # pylint: disable=broad-except
+            log.error("could not create %s %s due to: %s", kind, name, exp)
+            ret['comment'] = str(exp)
+            ret['result'] = False
+    return key, ret
+
+
+def _is_mirror_pod(pod):
+    """ static pods are restored by kubelet, so they never go away during drain """
+    return bool(_get_annotation(pod, "kubernetes.io/config.mirror"))
+
+
+@tornado.gen.coroutine
+def _remove_pod(async_k8s, namespace, name, grace_period=None, evict=False):
+    """ delete or evict pod, resolves to the time request was accepted """
+    url = async_k8s.get_path("pods", namespace, name)
+    delete_options = {"kind": "DeleteOptions", "apiVersion": "v1"}
+    if grace_period is not None:
+        delete_options["gracePeriodSeconds"] = grace_period
+    if evict:
+        # eviction respects pod disruption budgets
+        yield async_k8s.post(url + "/eviction", {
+            "kind": "Eviction",
+            "apiVersion": "policy/v1beta1",
+            "metadata": {"name": name, "namespace": namespace},
+            "deleteOptions": delete_options
+        })
+    elif grace_period is not None:
+        yield async_k8s.delete(url, delete_options)
+    else:
+        yield async_k8s.delete(url)
+    raise tornado.gen.Return(time.time())
+
 
+def _wait_pods_gone(k8s, pending, data, resource_version, deadline):
+    """ wait till all pending (namespace, name) pods are deleted with the single
+    watch of pods collection, returns {(namespace, name): deletion time} """
+    gone = {}
+    params = dict(data, resourceVersion=resource_version)
+    while pending and time.time() < deadline:
+        try:
+            for event_type, pod in k8s.watch(k8s.get_path("pods"), params, deadline - time.time()):
+                params["resourceVersion"] = traverse_dict(pod, "metadata:resourceVersion", params["resourceVersion"])
+                key = (traverse_dict(pod, "metadata:namespace", ""), traverse_dict(pod, "metadata:name", ""))
+                if event_type == "DELETED" and key in pending:
+                    pending.discard(key)
+                    gone[key] = time.time()
+                elif event_type == "ERROR":
+                    raise Exception(pod)
+                if not pending or time.time() >= deadline:
+                    break
+        except Exception as exp:  # pylint: disable=broad-except
+            if _get_status_code(exp) != 410:
+                raise
+            # resourceVersion is compacted away, resume the watch from a new list
+            log.debug("watch of pods is expired, listing them again")
+            params["resourceVersion"] = _relist_pods_gone(k8s, pending, gone, data)
+    return gone
+
+
+def _relist_pods_gone(k8s, pending, gone, data):
+    """ move pending pods the list does not have anymore to gone, returns
+    resourceVersion of the list """
+    meta = {}
+    with k8s.uncached():
+        listed = set((traverse_dict(pod, "metadata:namespace", "default"),
+                      traverse_dict(pod, "metadata:name", "default"))
+                     for pod in k8s.iter_items(k8s.get_path("pods"), data, meta=meta,
+                                               fields=["metadata:namespace", "metadata:name"]))
+    for key in pending - listed:
+        pending.discard(key)
+        gone[key] = time.time()
+    return meta.get("resourceVersion", "")
+
+
+def drain(node, grace_period=None, concurrency=None, evict=False, timeout=None,
+          kubeconfig="", context_name="", k8s=None):
+    """
+    .. versionadded:: 2016.3.0
 
-def drain(node, grace_period=None, kubeconfig="", context_name="", k8s=None):
+    Delete (or evict, evict=True) all pods of the node. Requests are made by
+    the pool of concurrency workers (k8s.drain_concurrency minion option,
+    10 by default), then termination of the pods is awaited with single watch
+    for timeout seconds (k8s.drain_timeout, 300 by default).
+
+    Changes contain per pod number of seconds it took to accept the request
+    and for the pod to terminate.
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' k8s.drain kube-node.cluster.local
+        salt '*' k8s.drain kube-node.cluster.local concurrency=20 evict=True
+
+    """
     ret = {'name': "drain", 'result': True, 'comment': '', 'changes': {}}
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return drain(node=node, kubeconfig=kubeconfig, context_name=context_name, k8s=k8s)
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(drain(node=node, grace_period=grace_period, concurrency=concurrency,
+                                    evict=evict, timeout=timeout, kubeconfig=kubeconfig,
+                                    context_name=context_name, k8s=k8s))
+    if concurrency is None:
+        concurrency = int(_get_opt('k8s.drain_concurrency', 10))
+    if timeout is None:
+        timeout = float(_get_opt('k8s.drain_timeout', 300))
+
+    action = "evicted" if evict else "deleted"
+    data = {"fieldSelector": _prepare_selector({"spec.nodeName": node})}
     try:
         log.info("draining node %s", node)
-        for pod in get("pods", field_selector={"spec.nodeName": node}, k8s=k8s).get('items'):
-            namespace = traverse_dict(pod, "metadata:namespace", "default")
-            name = traverse_dict(pod, "metadata:name", "default")
-            ret['changes'].setdefault(namespace, {})[name] = "pod deleted"
-            delete("pods", namespace, name, grace_period=grace_period, k8s=k8s)
+        meta = {}
+        keys = []
+        # only the fields drain needs are decoded out of the list stream
+        for pod in k8s.iter_items(k8s.get_path("pods"), data, meta=meta,
+                                  fields=["metadata:namespace", "metadata:name",
+                                          "metadata:annotations:kubernetes.io/config.mirror"]):
+            key = (traverse_dict(pod, "metadata:namespace", "default"),
+                   traverse_dict(pod, "metadata:name", "default"))
+            if _is_mirror_pod(pod):
+                log.debug("skipping mirror pod %s", key[1])
+                continue
+            keys.append(key)
+        calls = [(_remove_pod, pod_key + (grace_period, evict)) for pod_key in keys]
+
+        started = time.time()
+        pending = set()
+        for key, res in zip(keys, k8s.gather(calls, concurrency)):
+            namespace, name = key
+            if isinstance(res, Exception):
+                log.error("could not remove pod %s due to: %s", name, res)
+                ret['result'] = False
+                ret['changes'].setdefault(namespace, {})[name] = {"status": "failed", "error": str(res)}
+            else:
+                pending.add(key)
+                ret['changes'].setdefault(namespace, {})[name] = {
+                    "status": "pod {0}".format(action),
+                    "requested": round(res - started, 3)
+                }
+
+        gone = _wait_pods_gone(k8s, pending, data, meta.get("resourceVersion", ""), started + timeout)
+        for (namespace, name), finished in six.iteritems(gone):
+            ret['changes'][namespace][name]["terminated"] = round(finished - started, 3)
+        if pending:
+            ret['result'] = False
+            ret['comment'] = "pods {0} are not terminated in {1} seconds".format(
+                ', '.join(sorted(name for _, name in pending)), timeout)
+        else:
+            ret['comment'] = "{0} pods {1} in {2} seconds".format(len(keys), action, round(time.time() - started, 3))
     except Exception as exp:
         log.error("oops drain of the node failed due to %s", exp)
         ret['result'] = False
@@ -2162,8 +2259,8 @@ def drain(node, grace_period=None, kubeconfig="", context_name="", k8s=None):
 def cordon(node, kubeconfig="", context_name="", k8s=None):
     ret = {'name': "cordon", 'result': True, 'comment': '', 'changes': {}}
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return cordon(node=node, kubeconfig=kubeconfig, context_name=context_name, k8s=k8s)
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(cordon(node=node, kubeconfig=kubeconfig, context_name=context_name, k8s=k8s))
 
     data = {'spec': {'unschedulable': True}}
     try:
@@ -2182,8 +2279,8 @@ def cordon(node, kubeconfig="", context_name="", k8s=None):
 def uncordon(node, kubeconfig="", context_name="", k8s=None):
     ret = {'name': "uncordon", 'result': True, 'comment': '', 'changes': {}}
     if not k8s:
-        with Kubernetes(kubeconfig, context_name) as k8s:
-            return uncordon(node=node, kubeconfig=kubeconfig, context_name=context_name, k8s=k8s)
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(uncordon(node=node, kubeconfig=kubeconfig, context_name=context_name, k8s=k8s))
 
     data = {'spec': {'unschedulable': None}}
     try:
@@ -2197,3 +2294,216 @@ def uncordon(node, kubeconfig="", context_name="", k8s=None):
         ret['result'] = False
         ret['comment'] = str(exp)
     return ret
+
+
+def _get_owner_kind(pod):
+    """ get kind of the controller owning the pod, either from ownerReferences
+    or from the legacy created-by annotation """
+    for owner in traverse_dict(pod, "metadata:ownerReferences", []) or []:
+        if owner.get("controller", True):
+            return owner.get("kind")
+    created_by = _get_annotation(pod, "kubernetes.io/created-by")
+    if created_by:
+        try:
+            return json.loads(created_by).get("reference", {}).get("kind")
+        except ValueError:
+            pass
+    return None
+
+
+def _is_pod_ready(pod):
+    for condition in traverse_dict(pod, "status:conditions", []) or []:
+        if condition.get("type") == "Ready":
+            return condition.get("status") == "True"
+    return False
+
+
+def _is_rescheduled(pod):
+    """ check that the pod comes back on another node once it is evicted:
+    controller owned pods which still run, finished pods and pods of jobs
+    are not restarted elsewhere """
+    if _is_mirror_pod(pod) or _get_owner_kind(pod) in (None, "DaemonSet", "Job"):
+        return False
+    return traverse_dict(pod, "status:phase", None) not in ("Succeeded", "Failed")
+
+
+def _get_rescheduled_pods(k8s, nodes):
+    """ get pods of the nodes which are expected to come back on other nodes,
+    grouped by (namespace, labels) with the number of ready pods of the group
+    outside of the nodes there must be once they are back: the ones ready
+    there before the drain and the ones of the nodes """
+    expected = {}
+    for node in nodes:
+        pods = get("pods", field_selector={"spec.nodeName": node}, k8s=k8s)
+        for pod in pods.get("items", []):
+            if not _is_rescheduled(pod):
+                continue
+            labels = k8s.get_labels(pod) or {}
+            key = (traverse_dict(pod, "metadata:namespace", "default"), tuple(sorted(labels.items())))
+            expected[key] = expected.get(key, 0) + 1
+    for (namespace, labels) in expected:
+        expected[(namespace, labels)] += _count_ready_elsewhere(k8s, namespace, labels, nodes)
+    return expected
+
+
+def _count_ready_elsewhere(k8s, namespace, labels, nodes):
+    """ count ready pods with the labels running outside of the nodes """
+    with k8s.uncached():
+        pods = k8s.get(k8s.get_path("pods", namespace), {"labelSelector": _prepare_selector(dict(labels))})
+    return len([pod for pod in pods.get("items", [])
+                if traverse_dict(pod, "spec:nodeName", None) not in nodes and _is_rescheduled(pod) and
+                _is_pod_ready(pod)])
+
+
+def _pods_ready_elsewhere(k8s, expected, nodes):
+    """ check that for every group of the evicted pods the expected number of
+    ready pods runs outside of the nodes, see _get_rescheduled_pods """
+    for (namespace, labels), count in six.iteritems(expected):
+        ready = _count_ready_elsewhere(k8s, namespace, labels, nodes)
+        if ready < count:
+            log.debug("%s of %s pods with labels %s are ready on %s namespace",
+                      ready, count, dict(labels), namespace)
+            return False
+    return True
+
+
+def _is_node_available(node):
+    if traverse_dict(node, "spec:unschedulable", False):
+        return False
+    for condition in traverse_dict(node, "status:conditions", []) or []:
+        if condition.get("type") == "Ready":
+            return condition.get("status") == "True"
+    return False
+
+
+def _drain_wave(k8s, wave, **kwargs):
+    """ drain the nodes of the wave at once, return the drain result of every node """
+    if len(wave) < 2:
+        return [drain(node, k8s=k8s, **kwargs) for node in wave]
+    # workers share the async client, create it before they start
+    k8s.async_client()
+    pool = ThreadPool(len(wave))
+    try:
+        run = k8s.run
+
+        def drain_joined(node):
+            """ drain the node within the run of the calling thread """
+            with k8s.joined(run):
+                return drain(node, k8s=k8s, **kwargs)
+        return pool.map(drain_joined, wave)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def rolling_maintenance(nodes=None, label_selector=None, parallelism=1, max_unavailable=1,
+                        ready_timeout=600, poll_interval=5, grace_period=None,
+                        concurrency=None, evict=False, drain_timeout=None,
+                        kubeconfig="", context_name="", k8s=None):
+    """
+    .. versionadded:: 2016.3.0
+
+    Cordon, drain and uncordon nodes of the cluster in waves.
+
+    Each wave takes up to parallelism nodes, but never makes more than
+    max_unavailable nodes of the cluster unavailable (cordoned or not ready
+    nodes outside of the wave are counted as well). The wave nodes are
+    cordoned and drained at once, then the wave waits up to ready_timeout
+    seconds for the controller owned pods it evicted to become ready on other
+    nodes (pods of jobs and finished pods are not waited for) and uncordons
+    the nodes. In case the pods do not come back, wave nodes are left
+    cordoned and the run stops.
+
+    nodes is a list (or comma separated string) of node names, otherwise nodes
+    are selected by label_selector. One of them is required, so the whole
+    cluster is never maintained by mistake.
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' k8s.rolling_maintenance nodes=node01,node02,node03 parallelism=2 max_unavailable=2
+        salt '*' k8s.rolling_maintenance label_selector='{"role": "worker"}' parallelism=5 max_unavailable=3
+
+    """
+    ret = {'name': "rolling_maintenance", 'result': True, 'comment': '', 'changes': {}}
+    if not k8s:
+        with _get_client(kubeconfig, context_name) as k8s:
+            return k8s.report(rolling_maintenance(nodes=nodes, label_selector=label_selector,
+                                                  parallelism=parallelism, max_unavailable=max_unavailable,
+                                                  ready_timeout=ready_timeout, poll_interval=poll_interval,
+                                                  grace_period=grace_period, concurrency=concurrency,
+                                                  evict=evict, drain_timeout=drain_timeout,
+                                                  kubeconfig=kubeconfig, context_name=context_name, k8s=k8s))
+
+    if isinstance(nodes, six.string_types):
+        nodes = [i.strip() for i in nodes.split(",") if i.strip()]
+    if not nodes and not label_selector:
+        ret['result'] = False
+        ret['comment'] = "nodes or label_selector is required"
+        return ret
+    if not nodes:
+        nodes = get("nodes", names_only=True, label_selector=label_selector, k8s=k8s)
+    pending = list(nodes)
+
+    while pending:
+        try:
+            with k8s.uncached():
+                cluster = dict((k8s.get_names(i)[0], i) for i in get("nodes", k8s=k8s).get("items", []))
+        except Exception as exp:  # pylint: disable=broad-except
+            ret['result'] = False
+            ret['comment'] = "could not get nodes due to: {0}".format(exp)
+            return ret
+        unavailable = [name for name, item in six.iteritems(cluster)
+                       if name not in pending and not _is_node_available(item)]
+        size = min(int(parallelism), int(max_unavailable) - len(unavailable))
+        if size <= 0:
+            ret['result'] = False
+            ret['comment'] = "no maintenance possible, nodes {0} are unavailable already".format(
+                ', '.join(sorted(unavailable)))
+            return ret
+
+        wave, pending = pending[:size], pending[size:]
+        log.info("starting maintenance of nodes %s", wave)
+        expected = _get_rescheduled_pods(k8s, wave)
+
+        for node in wave:
+            res = cordon(node, k8s=k8s)
+            ret['changes'][node] = {"cordon": res.get("result")}
+            if not res.get("result"):
+                ret['result'] = False
+                ret['comment'] = "could not cordon {0}: {1}".format(node, res.get("comment"))
+                return ret
+        results = _drain_wave(k8s, wave, grace_period=grace_period, concurrency=concurrency,
+                              evict=evict, timeout=drain_timeout)
+        failed = []
+        for node, res in zip(wave, results):
+            ret['changes'][node]["drain"] = res.get("comment")
+            if not res.get("result"):
+                failed.append("could not drain {0}: {1}".format(node, res.get("comment")))
+        if failed:
+            ret['result'] = False
+            ret['comment'] = "\n".join(failed)
+            return ret
+
+        started = time.time()
+        while not _pods_ready_elsewhere(k8s, expected, wave):
+            if time.time() - started > ready_timeout:
+                ret['result'] = False
+                ret['comment'] = "pods evicted from {0} are not ready in {1} seconds, " \
+                                 "nodes are left cordoned".format(', '.join(wave), ready_timeout)
+                return ret
+            time.sleep(poll_interval)
+
+        for node in wave:
+            res = uncordon(node, k8s=k8s)
+            ret['changes'][node]["ready_after"] = round(time.time() - started, 3)
+            ret['changes'][node]["uncordon"] = res.get("result")
+            if not res.get("result"):
+                ret['result'] = False
+                ret['comment'] = "could not uncordon {0}: {1}".format(node, res.get("comment"))
+                return ret
+        log.info("finished maintenance of nodes %s", wave)
+
+    ret['comment'] = "maintenance of {0} nodes is finished".format(len(nodes))
+    return ret
@@ -10,7 +10,15 @@ import json
 import yaml
 import hashlib
 import base64
+import errno
+import os
+import imp
+import shutil
+import socket
+import tempfile
 import time
+import requests
+from requests.packages.urllib3.exceptions import MaxRetryError, NewConnectionError
 from subprocess import Popen, PIPE
 import salt.modules.k8s as k8s
 # Import Salt Testing libs
@@ -673,6 +681,504 @@ class TestK8SReplicationController(TestCase):
         print calc(containers)
 
 
+# k8s module next to this file, salt.modules.k8s is the one shipped with salt.
+# The module imports its client out of _k8s_client next to it
+ensure_in_syspath(os.path.dirname(os.path.abspath(__file__)))
+local_k8s = imp.load_source('local_k8s', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'k8s.py'))
+k8s_client = local_k8s._k8s_client
+
+
+def _set_opts(opts):
+    ''' minion options of local k8s module '''
+    k8s_client.configure(opts)
+
+
+def _kubeconfig():
+    ''' write kubeconfig of the api server which is never reached '''
+    fd, kubeconfig = tempfile.mkstemp()
+    with os.fdopen(fd, 'w') as f:
+        yaml.safe_dump({'current-context': 'test',
+                        'contexts': [{'name': 'test', 'context': {'cluster': 'test', 'user': 'test'}}],
+                        'clusters': [{'name': 'test', 'cluster': {'server': 'http://127.0.0.1:1'}}],
+                        'users': [{'name': 'test', 'user': {'token': 'token'}}]}, f)
+    return kubeconfig
+
+
+def _local_client():
+    ''' client of local k8s module, tests replace its request method '''
+    kubeconfig = _kubeconfig()
+    try:
+        client = k8s_client.Kubernetes(kubeconfig)
+    finally:
+        os.unlink(kubeconfig)
+    # kinds known to the module only, there is no api server to discover
+    client.resources, client.resources_expire = {}, float('inf')
+    client.request = _unexpected_request
+    return client
+
+
+def _unexpected_request(method, path, **kwargs):
+    raise AssertionError('unexpected request {0} {1}'.format(method, path))
+
+
+def _answering_client(answers):
+    ''' client answering requests with the _Response of (method, path) out of
+    answers, returns it with the list of the requests made '''
+    client = _local_client()
+    sent = []
+
+    def request(method, path, params=None, data=None, headers=None, stream=False):
+        sent.append((method, path))
+        return answers[(method, path)]
+    client.request = request
+    return client, sent
+
+
+class _Response(object):
+    ''' recorded answer of the api server '''
+
+    def __init__(self, content, content_type='application/json', status_code=200):
+        self.content = self.text = content
+        self.headers = {'Content-Type': content_type}
+        self.status_code = status_code
+
+    def close(self):
+        pass
+
+
+def _pb_field(number, value):
+    ''' encode protobuf field, ints as varints and strings length delimited '''
+    def varint(value):
+        out = ''
+        while value > 0x7f:
+            out += chr(value & 0x7f | 0x80)
+            value >>= 7
+        return out + chr(value)
+    if isinstance(value, (int, long)):
+        return varint(number << 3) + varint(value)
+    return varint(number << 3 | 2) + varint(len(value)) + value
+
+
+def _pb_object(kind, raw):
+    type_meta = _pb_field(1, 'v1') + _pb_field(2, kind)
+    return 'k8s\x00' + _pb_field(1, type_meta) + _pb_field(2, raw) + _pb_field(4, 'application/vnd.kubernetes.protobuf')
+
+
+class TestK8SProtobuf(TestCase):
+
+    def test_decode_pod(self):
+        meta = (_pb_field(1, 'web') + _pb_field(3, 'default') + _pb_field(6, '42') +
+                _pb_field(8, _pb_field(1, 1500000000)) +
+                _pb_field(11, _pb_field(1, 'app') + _pb_field(2, 'web')))
+        spec = (_pb_field(2, _pb_field(1, 'nginx') + _pb_field(2, 'nginx:1.11') +
+                          _pb_field(6, _pb_field(3, 80) + _pb_field(4, 'TCP'))) +
+                _pb_field(10, 'node-1') + _pb_field(4, (1 << 64) - 1))
+        status = _pb_field(1, 'Running') + _pb_field(8, _pb_field(1, 'nginx') + _pb_field(4, 1))
+        obj, unknown = k8s_client._decode_protobuf(_pb_object('Pod', _pb_field(1, meta) + _pb_field(2, spec) +
+                                                        _pb_field(3, status)))
+        self.assertEqual(unknown, set())
+        self.assertEqual(obj, {
+            'kind': 'Pod',
+            'apiVersion': 'v1',
+            'metadata': {'name': 'web', 'namespace': 'default', 'resourceVersion': '42',
+                         'creationTimestamp': '2017-07-14T02:40:00Z', 'labels': {'app': 'web'}},
+            'spec': {'containers': [{'name': 'nginx', 'image': 'nginx:1.11',
+                                     'ports': [{'containerPort': 80, 'protocol': 'TCP'}]}],
+                     'nodeName': 'node-1', 'terminationGracePeriodSeconds': -1},
+            'status': {'phase': 'Running', 'containerStatuses': [{'name': 'nginx', 'ready': True}]}})
+
+    def test_decode_list(self):
+        node = _pb_field(1, _pb_field(1, 'node-1')) + _pb_field(2, _pb_field(4, 1))
+        secret = _pb_field(1, _pb_field(1, 'token')) + _pb_field(2, _pb_field(1, 'key') + _pb_field(2, 'value'))
+        obj, unknown = k8s_client._decode_protobuf(_pb_object('NodeList', _pb_field(1, _pb_field(3, 'next')) +
+                                                        _pb_field(2, node)))
+        self.assertEqual(unknown, set())
+        self.assertEqual(obj['metadata'], {'continue': 'next'})
+        self.assertEqual(obj['items'], [{'metadata': {'name': 'node-1'}, 'spec': {'unschedulable': True}}])
+        obj, unknown = k8s_client._decode_protobuf(_pb_object('Secret', secret))
+        self.assertEqual(obj['data'], {'key': base64.b64encode('value')})
+
+    def test_decode_volumes_and_states(self):
+        volume = _pb_field(1, 'data') + _pb_field(2, _pb_field(19, _pb_field(1, _pb_field(1, 'config'))))
+        container = (_pb_field(1, 'app') + _pb_field(8, _pb_field(1, _pb_field(1, 'cpu') + _pb_field(2, _pb_field(1, '500m')))) +
+                     _pb_field(9, _pb_field(1, 'data') + _pb_field(3, '/data')) + _pb_field(99, 'new'))
+        status = _pb_field(8, _pb_field(1, 'app') + _pb_field(2, _pb_field(2, _pb_field(1, _pb_field(1, 0)))))
+        obj, unknown = k8s_client._decode_protobuf(_pb_object('Pod', _pb_field(2, _pb_field(1, volume) +
+                                                                                  _pb_field(2, container)) +
+                                                              _pb_field(3, status)))
+        self.assertEqual(unknown, set(['spec:containers']))
+        self.assertEqual(obj['spec'], {
+            'volumes': [{'name': 'data', 'configMap': {'name': 'config'}}],
+            'containers': [{'name': 'app', 'resources': {'limits': {'cpu': '500m'}},
+                            'volumeMounts': [{'name': 'data', 'mountPath': '/data'}]}]})
+        self.assertEqual(obj['status'], {'containerStatuses': [
+            {'name': 'app', 'state': {'running': {'startedAt': '1970-01-01T00:00:00Z'}}}]})
+
+    def test_decode_unknown_field(self):
+        obj, unknown = k8s_client._decode_protobuf(_pb_object('Namespace', _pb_field(1, _pb_field(1, 'default')) +
+                                                        _pb_field(99, 'new')))
+        self.assertEqual(unknown, set(['']))
+        self.assertEqual(obj['metadata'], {'name': 'default'})
+        self.assertRaises(ValueError, k8s_client._decode_protobuf, _pb_object('Deployment', ''))
+        self.assertRaises(ValueError, k8s_client._decode_protobuf, '{"kind": "Pod"}')
+
+    def _recording_client(self, responses):
+        client = _local_client()
+        client.protobuf = True
+        sent = []
+
+        def request(method, path, params=None, data=None, headers=None, stream=False):
+            sent.append((method, path, (headers or {}).get('Accept')))
+            return responses.pop(0)
+        client.request = request
+        return client, sent
+
+    def test_get_in_protobuf(self):
+        pod = _pb_object('Pod', _pb_field(1, _pb_field(1, 'web')) +
+                         _pb_field(2, _pb_field(22, _pb_field(1, 'node') + _pb_field(2, 'Exists'))))
+        client, sent = self._recording_client([_Response(pod, k8s_client.PROTOBUF_TYPE)])
+        self.assertEqual(client.fetch('/api/v1/namespaces/default/pods/web'), {
+            'kind': 'Pod', 'apiVersion': 'v1', 'metadata': {'name': 'web'},
+            'spec': {'tolerations': [{'key': 'node', 'operator': 'Exists'}]}})
+        self.assertEqual(sent, [('GET', '/api/v1/namespaces/default/pods/web', k8s_client.PROTOBUF_ACCEPT)])
+
+    def test_list_in_protobuf(self):
+        page = _pb_object('NodeList', _pb_field(2, _pb_field(1, _pb_field(1, 'node-1'))) +
+                          _pb_field(2, _pb_field(1, _pb_field(1, 'node-2'))))
+        client, sent = self._recording_client([_Response(page, k8s_client.PROTOBUF_TYPE)])
+        names = [i['metadata']['name'] for i in client.iter_items('/api/v1/nodes')]
+        self.assertEqual(names, ['node-1', 'node-2'])
+        self.assertEqual([accept for _, _, accept in sent], [k8s_client.PROTOBUF_ACCEPT])
+
+    def test_unknown_fields_read_in_json(self):
+        pod = _pb_object('Pod', _pb_field(1, _pb_field(1, 'web')) + _pb_field(2, _pb_field(99, 'new')))
+        body = json.dumps({'kind': 'Pod', 'metadata': {'name': 'web'}, 'spec': {'new': 'field'}})
+        client, sent = self._recording_client([_Response(pod, k8s_client.PROTOBUF_TYPE), _Response(body),
+                                               _Response(body)])
+        path = '/api/v1/namespaces/default/pods/web'
+        self.assertEqual(client.fetch(path)['spec'], {'new': 'field'})
+        # the kind is read in json right away afterwards
+        self.assertEqual(client.fetch(path)['spec'], {'new': 'field'})
+        self.assertEqual([accept for _, _, accept in sent], [k8s_client.PROTOBUF_ACCEPT, None, None])
+
+    def test_other_kinds_in_json(self):
+        body = json.dumps({'kind': 'Deployment', 'metadata': {'name': 'web'}})
+        client, sent = self._recording_client([_Response(body)])
+        client.fetch('/apis/extensions/v1beta1/namespaces/default/deployments/web')
+        self.assertEqual(sent, [('GET', '/apis/extensions/v1beta1/namespaces/default/deployments/web', None)])
+
+
+class TestK8SJSONStream(TestCase):
+
+    def test_values_across_chunks(self):
+        text = json.dumps({'kind': 'PodList', 'metadata': {'resourceVersion': '7'},
+                           'items': [{'metadata': {'name': 'p{0}'.format(i), 'labels': {'a': 'b c'}}}
+                                     for i in range(20)]}, indent=1)
+        for size in (1, 2, 7, 64, len(text)):
+            members = {}
+            chunks = [text[i:i + size] for i in range(0, len(text), size)]
+            items = list(k8s_client._iter_json_list(iter(chunks), members))
+            self.assertEqual([i['metadata']['name'] for i in items], ['p{0}'.format(i) for i in range(20)])
+            self.assertEqual(members, {'kind': 'PodList', 'metadata': {'resourceVersion': '7'}})
+
+    def test_empty_and_missing_items(self):
+        members = {}
+        self.assertEqual(list(k8s_client._iter_json_list(iter(['{"items": [', ' ]}']), members)), [])
+        self.assertEqual(list(k8s_client._iter_json_list(iter(['{"kind":', '"Status"}']), members)), [])
+        self.assertEqual(members, {'kind': 'Status'})
+        self.assertEqual(list(k8s_client._iter_json_list(iter(['{', '}']), {})), [])
+
+    def test_truncated(self):
+        items = k8s_client._iter_json_list(iter(['{"items": [{"a": 1}, {"a"']), {})
+        self.assertEqual(next(items), {'a': 1})
+        self.assertRaises(ValueError, next, items)
+
+
+class TestK8SRetry(TestCase):
+
+    def setUp(self):
+        self.client = _local_client()
+        self.client.retry_max = 3
+
+    def test_verbs_and_codes(self):
+        delay = self.client.retry_delay
+        self.assertIsNotNone(delay('GET', 0, code=503))
+        self.assertIsNone(delay('POST', 0, code=503))
+        self.assertIsNotNone(delay('POST', 0, code=429))
+        self.assertIsNone(delay('GET', 0, code=404))
+        self.assertIsNone(delay('GET', 0, code=200))
+        # broken connection: the request could be processed already
+        self.assertIsNotNone(delay('PUT', 0, error=True))
+        self.assertIsNone(delay('PATCH', 0, error=True))
+        self.assertIsNotNone(delay('PATCH', 0, error=True, connect_error=True))
+        self.assertIsNone(delay('GET', 3, code=503))
+
+    def test_retry_after(self):
+        self.client.retry_max_delay = 5
+        self.assertEqual(self.client.retry_delay('POST', 0, code=429, retry_after='4'), 4)
+        self.assertEqual(self.client.retry_delay('POST', 0, code=429, retry_after='60'), 5)
+        self.assertLessEqual(self.client.retry_delay('POST', 0, code=429, retry_after='soon'), 5)
+
+    def test_budget(self):
+        self.client.run.retry_budget = 2
+        self.assertIsNotNone(self.client.retry_delay('GET', 0, code=503))
+        self.assertIsNotNone(self.client.retry_delay('GET', 0, code=503))
+        self.assertIsNone(self.client.retry_delay('GET', 0, code=503))
+        self.assertEqual(self.client.run.retries, 2)
+        with self.client:
+            # every run has a budget of its own
+            self.assertIsNotNone(self.client.retry_delay('GET', 0, code=503))
+
+    def test_connect_errors(self):
+        # as requests raises it
+        refused = requests.exceptions.ConnectionError(MaxRetryError(
+            None, '/', NewConnectionError(None, 'Failed to establish a new connection')))
+        self.assertTrue(k8s_client._is_connect_error(refused))
+        self.assertTrue(k8s_client._is_connect_error(requests.exceptions.ConnectTimeout()))
+        self.assertTrue(k8s_client._is_connect_error(socket.error(errno.ECONNREFUSED, 'refused')))
+        self.assertFalse(k8s_client._is_connect_error(socket.error(errno.ECONNRESET, 'reset')))
+        self.assertFalse(k8s_client._is_connect_error(requests.exceptions.ChunkedEncodingError()))
+        self.assertFalse(k8s_client._is_connect_error(requests.exceptions.ReadTimeout()))
+
+
+class TestK8SMemo(TestCase):
+
+    def setUp(self):
+        self.client = _local_client()
+
+    def _memoize(self, *paths):
+        for path in paths:
+            self.client.memo_put(path, None, {'path': path})
+
+    def _memoized(self):
+        return sorted(path for path, _ in self.client.memo)
+
+    def test_forget_object(self):
+        with self.client:
+            self._memoize('/api/v1/namespaces/a/pods/web', '/api/v1/namespaces/a/pods/db',
+                          '/api/v1/namespaces/a/pods', '/api/v1/pods', '/api/v1/namespaces/a/services/web',
+                          '/api/v1/namespaces/b/pods/web')
+            self.client.forget('/api/v1/namespaces/a/pods/web')
+            self.assertEqual(self._memoized(), ['/api/v1/namespaces/a/pods/db', '/api/v1/namespaces/a/services/web',
+                                                '/api/v1/namespaces/b/pods/web'])
+
+    def test_forget_subresource_and_collection(self):
+        with self.client:
+            self._memoize('/api/v1/namespaces/a/pods/web', '/api/v1/namespaces/a/pods',
+                          '/api/v1/namespaces/a/services')
+            self.client.forget('/api/v1/namespaces/a/pods/web/eviction')
+            self.assertEqual(self._memoized(), ['/api/v1/namespaces/a/services'])
+            self._memoize('/api/v1/namespaces/a/pods/web', '/api/v1/namespaces/a/pods/db')
+            # POST to the collection could change any object of the kind
+            self.client.forget('/api/v1/namespaces/a/pods')
+            self.assertEqual(self._memoized(), ['/api/v1/namespaces/a/services'])
+
+    def test_forget_namespace(self):
+        with self.client:
+            self._memoize('/api/v1/namespaces/a', '/api/v1/namespaces', '/api/v1/namespaces/a/pods/web',
+                          '/api/v1/namespaces/b')
+            self.client.forget('/api/v1/namespaces/a')
+            self.assertEqual(self._memoized(), ['/api/v1/namespaces/b'])
+
+    def test_memo_of_the_run(self):
+        self.client.memo_put('/api/v1/namespaces/a', None, {})
+        self.assertIsNone(self.client.memo_get('/api/v1/namespaces/a'))
+        with self.client:
+            self.client.memo_put('/api/v1/namespaces/a', None, {'kind': 'Namespace'})
+            self.assertEqual(self.client.memo_get('/api/v1/namespaces/a'), {'kind': 'Namespace'})
+            with self.client.uncached():
+                self.assertIsNone(self.client.memo_get('/api/v1/namespaces/a'))
+        with self.client:
+            self.assertIsNone(self.client.memo_get('/api/v1/namespaces/a'))
+
+
+class TestK8SInformer(TestCase):
+
+    def setUp(self):
+        kubeconfig = _kubeconfig()
+        try:
+            self.informer = k8s_client._Informer(kubeconfig, '', '/api/v1/pods')
+        finally:
+            os.unlink(kubeconfig)
+        for namespace, name, node, labels, version in [('a', 'web', 'n1', {'app': 'web', 'tier': 'front'}, '1'),
+                                                       ('a', 'db', 'n2', {'app': 'db'}, '2'),
+                                                       ('b', 'web', 'n2', {'app': 'web'}, '3')]:
+            self.informer.update({'metadata': {'namespace': namespace, 'name': name, 'labels': labels,
+                                               'resourceVersion': version},
+                                  'spec': {'nodeName': node}})
+        self.informer.synced = True
+
+    def _names(self, namespace, data):
+        return [(i['metadata']['namespace'], i['metadata']['name'])
+                for i in self.informer.lookup(namespace, '', data)['items']]
+
+    def test_parse_selector(self):
+        self.assertEqual(k8s_client._parse_selector('app=web, tier==front'), [('app', 'web'), ('tier', 'front')])
+        self.assertEqual(k8s_client._parse_selector(''), [])
+        self.assertIsNone(k8s_client._parse_selector('app!=web'))
+        self.assertIsNone(k8s_client._parse_selector('app in (web)'))
+        self.assertIsNone(k8s_client._parse_selector('app'))
+
+    def test_lookup_object(self):
+        self.assertEqual(self.informer.lookup('a', 'web')['spec'], {'nodeName': 'n1'})
+        self.assertRaises(LookupError, self.informer.lookup, 'b', 'db')
+        self.informer.update({'metadata': {'namespace': 'a', 'name': 'web', 'resourceVersion': '4'}},
+                             'DELETED')
+        self.assertRaises(LookupError, self.informer.lookup, 'a', 'web')
+
+    def test_lookup_list(self):
+        self.assertEqual(self._names('', None), [('a', 'db'), ('a', 'web'), ('b', 'web')])
+        self.assertEqual(self._names('a', None), [('a', 'db'), ('a', 'web')])
+        self.assertEqual(self._names('', {'labelSelector': 'app=web'}), [('a', 'web'), ('b', 'web')])
+        self.assertEqual(self._names('', {'labelSelector': 'app=web,tier=front'}), [('a', 'web')])
+        self.assertEqual(self._names('', {'fieldSelector': 'spec.nodeName=n2'}), [('a', 'db'), ('b', 'web')])
+        self.assertEqual(self._names('', {'fieldSelector': 'spec.nodeName=n2', 'labelSelector': 'app=web'}),
+                         [('b', 'web')])
+
+    def test_lookup_unsupported(self):
+        self.assertIsNone(self.informer.lookup('', '', {'labelSelector': 'app!=web'}))
+        self.assertIsNone(self.informer.lookup('', '', {'limit': 10}))
+        self.assertIsNone(self.informer.lookup('a', 'web', {'labelSelector': 'app=web'}))
+        self.informer.synced = False
+        self.assertIsNone(self.informer.lookup('a', 'web'))
+
+    def test_stale_update(self):
+        self.informer.update({'metadata': {'namespace': 'a', 'name': 'db', 'resourceVersion': '1'},
+                              'spec': {'nodeName': 'n3'}})
+        self.assertEqual(self.informer.lookup('a', 'db')['spec'], {'nodeName': 'n2'})
+
+
+class TestK8SManifestCache(TestCase):
+
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp()
+        _set_opts({'cachedir': self.cachedir})
+        fd, self.filename = tempfile.mkstemp(suffix='.yaml')
+        with os.fdopen(fd, 'w') as f:
+            f.write('kind: Service\nmetadata:\n  name: web\n')
+        self.parsed = []
+
+    def tearDown(self):
+        _set_opts({})
+        os.unlink(self.filename)
+        shutil.rmtree(self.cachedir)
+
+    def _parse(self, content, filename):
+        self.parsed.append(filename)
+        return yaml.safe_load(content), True
+
+    def test_unchanged_file(self):
+        cache = k8s_client._ManifestCache()
+        self.assertEqual(cache.load(self.filename, self._parse), {'kind': 'Service', 'metadata': {'name': 'web'}})
+        manifest = cache.load(self.filename, self._parse)
+        self.assertEqual(len(self.parsed), 1)
+        # every load gets objects of its own
+        manifest['metadata']['name'] = 'db'
+        self.assertEqual(cache.load(self.filename, self._parse)['metadata']['name'], 'web')
+
+    def test_changed_file(self):
+        cache = k8s_client._ManifestCache()
+        cache.load(self.filename, self._parse)
+        with open(self.filename, 'w') as f:
+            f.write('kind: Service\nmetadata:\n  name: db\n')
+        os.utime(self.filename, (time.time() + 10, time.time() + 10))
+        self.assertEqual(cache.load(self.filename, self._parse)['metadata']['name'], 'db')
+        self.assertEqual(len(self.parsed), 2)
+
+    def test_disk_copy(self):
+        k8s_client._ManifestCache().load(self.filename, self._parse)
+        # cache of the next process
+        self.assertEqual(k8s_client._ManifestCache().load(self.filename, self._parse)['metadata']['name'], 'web')
+        self.assertEqual(len(self.parsed), 1)
+
+    def test_shared_directory(self):
+        directory = k8s_client._cache_dir('manifests')
+        os.chmod(directory, 0o777)
+        k8s_client._ManifestCache().load(self.filename, self._parse)
+        self.assertEqual(os.listdir(directory), [])
+        k8s_client._ManifestCache().load(self.filename, self._parse)
+        self.assertEqual(len(self.parsed), 2)
+
+
+class TestK8SCreate(TestCase):
+
+    def setUp(self):
+        self.client = _local_client()
+        fd, self.filename = tempfile.mkstemp(suffix='.yaml')
+        with os.fdopen(fd, 'w') as f:
+            yaml.safe_dump_all([{'kind': 'Deployment', 'metadata': {'name': 'web'}},
+                                {'kind': 'Service', 'metadata': {'name': 'web'}},
+                                {'kind': 'ConfigMap', 'metadata': {'name': 'web'}},
+                                {'kind': 'Namespace', 'metadata': {'name': 'team'}},
+                                {'kind': 'Secret', 'metadata': {'name': 'web'}}], f)
+        self.create_object = local_k8s._create_object
+        self.applied = []
+
+    def tearDown(self):
+        local_k8s._create_object = self.create_object
+        os.unlink(self.filename)
+
+    def _record(self, failing=()):
+        def create_object(k8s, data, namespace, **kwargs):
+            self.applied.append(data['kind'])
+            ret = {'result': data['kind'] not in failing, 'comment': '', 'changes': {}}
+            return local_k8s._object_key(k8s, data, namespace, True), ret
+        local_k8s._create_object = create_object
+
+    def test_tiers(self):
+        self._record()
+        ret = local_k8s.create(self.filename, namespace='team', force=False, k8s=self.client)
+        self.assertTrue(ret['result'])
+        self.assertEqual(self.applied[0], 'Namespace')
+        self.assertEqual(sorted(self.applied[1:3]), ['ConfigMap', 'Secret'])
+        self.assertEqual(self.applied[3:], ['Service', 'Deployment'])
+
+    def test_failed_tier(self):
+        self._record(failing=('Secret',))
+        ret = local_k8s.create(self.filename, namespace='team', force=False, k8s=self.client)
+        self.assertFalse(ret['result'])
+        self.assertEqual(sorted(self.applied), ['ConfigMap', 'Namespace', 'Secret'])
+        self.assertIn('2 objects were not applied after failure', ret['comment'])
+
+
+class TestK8SCreateListed(TestCase):
+
+    path = '/api/v1/namespaces/team/configmaps'
+    data = {'kind': 'ConfigMap', 'apiVersion': 'v1', 'metadata': {'name': 'web'}}
+    conflict = json.dumps({'kind': 'Status', 'status': 'Failure', 'reason': 'AlreadyExists', 'code': 409})
+
+    def test_created_after_list(self):
+        client, sent = _answering_client({
+            ('POST', self.path): _Response(self.conflict, status_code=409),
+            ('GET', self.path + '/web'): _Response(json.dumps(self.data))})
+        with client:
+            client.memo_put(self.path, None, {'kind': 'ConfigMapList', 'items': []})
+            key, ret = local_k8s._create_object(client, self.data, 'team', force=False)
+        self.assertEqual(key, 'configmaps team/web')
+        self.assertTrue(ret['result'])
+        self.assertEqual(sent, [('POST', self.path), ('GET', self.path + '/web'), ('GET', self.path + '/web')])
+
+    def test_missing_after_list(self):
+        client, sent = _answering_client({
+            ('POST', self.path): _Response(json.dumps({'kind': 'Status', 'status': 'Failure', 'code': 403}),
+                                          status_code=403),
+            ('GET', self.path + '/web'): _Response('{}', status_code=404)})
+        with client:
+            client.memo_put(self.path, None, {'kind': 'ConfigMapList', 'items': []})
+            key, ret = local_k8s._create_object(client, self.data, 'team', force=False)
+        self.assertFalse(ret['result'])
+        self.assertEqual(sent, [('POST', self.path), ('GET', self.path + '/web')])
+
+    def test_without_list(self):
+        client, sent = _answering_client({
+            ('POST', self.path): _Response(self.conflict, status_code=409),
+            ('GET', self.path + '/web'): _Response('{}', status_code=404)})
+        with client:
+            key, ret = local_k8s._create_object(client, self.data, 'team', force=False)
+        self.assertFalse(ret['result'])
+        self.assertEqual(sent, [('GET', self.path + '/web'), ('POST', self.path)])
+
+
 if __name__ == '__main__':
     from integration import run_tests
     run_tests(TestK8SNamespace,
@@ -682,4 +1188,12 @@ if __name__ == '__main__':
               TestK8SServices,
               TestK8SAnnotate,
               TestK8SReplicationController,
+              TestK8SJSONStream,
+              TestK8SRetry,
+              TestK8SMemo,
+              TestK8SInformer,
+              TestK8SManifestCache,
+              TestK8SProtobuf,
+              TestK8SCreate,
+              TestK8SCreateListed,
               needs_daemon=False)
@@ -55,18 +55,8 @@ def get_tmpfile(suffix=None):
 
 
 def load_manifest(filename):
-    with open(filename, 'r') as f:
-        data = {}
-        try:
-            data = yaml.load(f)
-        except yaml.YAMLError as exc:
-            log.error("yaml can't be loaded due to error: [{}]".format(exc))
-        except:
-            try:
-                data = json.load(f)
-            except:
-                log.error("manifest file {} is neither yaml nor json file or format is wrong")
-        return data
+    # parsed and cached by k8s module, so both read manifests the same way
+    return __salt__['k8s.load_manifest'](filename) or {}
 
 def get_path_data(relative_path, prefix=None):
     if prefix:
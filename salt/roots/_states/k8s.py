@@ -183,7 +183,8 @@ def limits_managed(name, namespace, limits, kubeconfig="", context_name="", upda
                                               update=update, force=force)
 
 
-def manage_manifest(name, namespace="", kubeconfig="", context_name="", force=True, replace_namespace=True, update=True, saltenv='base'):
+def manage_manifest(name, namespace="", kubeconfig="", context_name="", force=True, replace_namespace=True, update=True,
+                    saltenv='base', stream=False):
     '''
     Ensure the label folder doesn't exist on the kube node.
 
@@ -193,6 +194,9 @@ def manage_manifest(name, namespace="", kubeconfig="", context_name="", force=Tr
     apiserver
         K8S apiserver URL.
 
+    stream
+        Apply documents of the manifest while the following ones are parsed.
+
     '''
 
     # Use salt k8s module to set label
@@ -200,7 +204,7 @@ def manage_manifest(name, namespace="", kubeconfig="", context_name="", force=Tr
                                   kubeconfig=kubeconfig,
                                   context_name=context_name, force=force,
                                   replace_namespace=replace_namespace,
-                                  update=update, saltenv=saltenv)
+                                  update=update, saltenv=saltenv, stream=stream)
 
 
 def cordon(name, kubeconfig="", context_name=""):
@@ -211,9 +215,34 @@ def uncordon(name, kubeconfig="", context_name=""):
     return __salt__['k8s.uncordon'](node=name, kubeconfig=kubeconfig, context_name=context_name)
 
 
-def maintenance_mode(name, kubeconfig="", context_name=""):
+def maintenance_mode(name, kubeconfig="", context_name="", concurrency=None, evict=False, timeout=None):
     if __salt__['k8s.cordon'](node=name, kubeconfig=kubeconfig, context_name=context_name).get('result'):
-        return __salt__['k8s.drain'](node=name, kubeconfig=kubeconfig, context_name=context_name)
+        return __salt__['k8s.drain'](node=name, kubeconfig=kubeconfig, context_name=context_name,
+                                     concurrency=concurrency, evict=evict, timeout=timeout)
+
+def drain(name, kubeconfig="", context_name="", concurrency=None, evict=False, timeout=None):
+    return __salt__['k8s.drain'](node=name, kubeconfig=kubeconfig, context_name=context_name,
+                                 concurrency=concurrency, evict=evict, timeout=timeout)
+
+
+def rolling_maintenance(name, nodes=None, label_selector=None, parallelism=1,
+                        max_unavailable=1, ready_timeout=600, evict=False,
+                        kubeconfig="", context_name=""):
+    '''
+    Cordon, drain and uncordon the nodes in waves of parallelism nodes, keeping
+    at most max_unavailable nodes of the cluster out of service.
 
-def drain(name, kubeconfig="", context_name=""):
-    return __salt__['k8s.drain'](node=name, kubeconfig=kubeconfig, context_name=context_name)
+    name
+        Name of the maintenance run.
+
+    nodes
+        List of node names, otherwise nodes are selected by label_selector.
+
+    '''
+    ret = __salt__['k8s.rolling_maintenance'](nodes=nodes, label_selector=label_selector,
+                                              parallelism=parallelism,
+                                              max_unavailable=max_unavailable,
+                                              ready_timeout=ready_timeout, evict=evict,
+                                              kubeconfig=kubeconfig, context_name=context_name)
+    ret['name'] = name
+    return ret